@@ -1,6 +1,7 @@
 # BACKEND/celery_app.py
 from celery import Celery
 from celery.schedules import crontab
+from kombu import Queue
 import os
 # Allow env-vars to override the defaults
 BROKER_URL  = os.getenv("CELERY_BROKER_URL",  "redis://localhost:6379/0")
@@ -19,6 +20,10 @@ celery_app.conf.update(
     accept_content=["json"],
     timezone="Europe/Istanbul",
     task_soft_time_limit=30,
+    # SSV staged pipeline: one queue per stage, so fetch / plot / report can
+    # get their own workers (-Q ssv_plot -c 16 …); a plain worker consumes all
+    task_default_queue="celery",
+    task_queues=[Queue(q) for q in ("celery", "ssv_fetch", "ssv_plot", "ssv_report")],
 )
 
 celery_app.conf.beat_schedule = {
@@ -11,6 +11,38 @@ class Settings(BaseSettings):
     DASHBOARD_JWT_ALG: str = "HS256"             # or "RS256"
     DASHBOARD_JWT_SECRET: str = "CHANGE_ME"      # HS256 only
     DASHBOARD_JWT_PUBLIC_KEY: str | None = None  # RS256 public key (PEM)
+    SSV_DATA_SOURCE: str = "db"                  # "db" (sync engine, HTTP fallback) or "http"
+    SSV_HTTP_POOL_SIZE: int = 16                 # keep-alive connections per worker process
+    SSV_HTTP_RETRIES: int = 3                    # connect errors / 502-504, exponential backoff
+    SSV_SQL_GRID: bool = False                   # maps from SQL 50 m aggregates, not raw samples
+    SSV_CACHE_ENABLED: bool = True               # worker-side (siteid, date, tech) data cache
+    SSV_CACHE_DIR: str | None = None             # None → Backend/cache/ssv
+    SSV_CACHE_MAX_MB: int = 512                  # in-memory LRU bound per worker process
+    SSV_CACHE_TTL_S: int = 6 * 3600              # max staleness after a re-ingest (TTL-only cache)
+    SSV_GROUP_PREFETCH: bool = True              # one set-based fetch per TaskGroup into the cache
+    SSV_PREFETCH_TIME_LIMIT: int = 300           # soft limit (s) of the group prefetch task
+    SSV_TILE_URL: str = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+    SSV_TILE_CACHE: str | None = None            # None → Backend/cache/tiles.mbtiles
+    SSV_TILE_CACHE_MAX_MB: int = 1024            # LRU eviction above this
+    SSV_TILES_OFFLINE: bool = False              # render from the tile store only
+    SSV_RENDER_PROFILE: str = "excel"            # map DPI / encoding: excel | print
+    SSV_GRID_MODE: str = "samples"               # samples | median | mean | p10 | count
+    SSV_RENDER_CACHE_ENABLED: bool = True        # content-hashed store of rendered maps
+    SSV_RENDER_CACHE: str | None = None          # None → Backend/cache/renders.sqlite
+    SSV_RENDER_CACHE_MAX_MB: int = 512           # LRU eviction above this
+    SSV_REPORT_ENGINE: str = "xlsxwriter"        # xlsxwriter | openpyxl (workbook writer)
+    SSV_GROUP_WORKBOOK: bool = False             # one workbook per TaskGroup, a sheet per site
+    SSV_ASSEMBLE_TIME_LIMIT: int = 600           # soft limit (s) of finalize_ssv_group, hard = soft + 30
+    SSV_STAGED_PIPELINE: bool = False            # fetch → per-cell plot tasks → report (Celery chord)
+    SSV_STAGE_DIR: str | None = None             # None → Backend/cache/stages; shared by all workers
+    SSV_FETCH_TIME_LIMIT: int = 120              # soft limits (s) per stage, hard = soft + 30
+    SSV_PLOT_TIME_LIMIT: int = 120
+    SSV_REPORT_TIME_LIMIT: int = 300
+    SSV_VECTOR_GRID: bool = False                # also write <site>_<date>_4G.grid.geojson
+    SSV_PROJ_NETWORK: bool = False               # let PROJ download transformation grids
+    SSV_RENDER_POOL: bool = True                 # maps in spawned render processes
+    SSV_RENDER_PROCESSES: int = 0                # 0 → os.cpu_count()
+    SSV_RENDER_POOL_MIN_MAPS: int = 10           # fewer maps → render in-thread
     class Config:
         env_file = ".env"                  # if you read from .env
         env_file_encoding = "utf-8"
@@ -17,6 +17,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, with_polymorphic
 
 from database.result_archiver import ResultArchiver
+from tasks.SSV.group_workbook import has_sheets
 from database.status import GroupStatus, ItemStatus
 from database.db import NotFoundError
 from database.models_tasks import TaskGroup, TaskItem  # *all* subclasses are imported via with_polymorphic
@@ -263,6 +264,10 @@ async def ensure_group_archive(db: AsyncSession, gid: int) -> Path:
     if zip_path.exists():
         return zip_path
 
+    # sheet artifacts left → finalize_ssv_group hasn't assembled them yet
+    if has_sheets(archiver.outputs_dir / str(gid)):
+        raise NotFoundError(f"group {gid} is still being finalised")
+
     # try to build it from raw outputs; raise if nothing to archive
     created = archiver.archive_group(gid)
     if created is None:
@@ -0,0 +1,85 @@
+# database/kpi_hist.py
+"""
+KPI histogram cube – `public.kpi_hist`  (date, siteid_cellid, kpi, bin) → count
+
+* kept current by statement-level triggers on `all_data`: INSERT adds the
+  new rows' counts, DELETE takes the old rows' out, UPDATE does both,
+  TRUNCATE empties it (migrations/…_kpi_hist_cube.py, …_kpi_hist_delete_update.py)
+* changing the bins below needs a migration that rebuilds the cube and
+  re-creates the trigger functions with the new edges
+* `kpi_hist_frame` is the read path used by SSV4G.make_tables
+
+bin = width_bucket(value, inner edges) → 0 … len(labels)-1, which matches
+np.histogram over the same edges with -inf / +inf at both ends.
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from .models import kpi_hist
+
+# KPI → (edges, labels) – the distribution tables of the SSV report
+KPI_BINS: dict[str, tuple[list[float], list[str]]] = {
+    "rsrp": (
+        [-np.inf, -141, -120, -110, -100, -95, -90, -80, -70, -44, np.inf],
+        [
+            "X < -141", "[-141, -120)", "[-120, -110)", "[-110, -100)",
+            "[-100, -95)", "[-95, -90)", "[-90, -80)", "[-80, -70)",
+            "[-70, -44)", "X ≥ -44"
+        ],
+    ),
+    "rsrq": (
+        [-np.inf, -20, -18, -12, -10, -6, -3, np.inf],
+        [
+            "X < -20", "[-20, -18)", "[-18, -12)", "[-12, -10)",
+            "[-10, -6)", "[-6, -3)", "X ≥ -3"
+        ],
+    ),
+    "rssinr": (
+        [-np.inf, -20, -10, 0, 15, 25, 35, 50, np.inf],
+        [
+            "X < -20", "[-20, -10)", "[-10, 0)", "[0, 15)",
+            "[15, 25)", "[25, 35)", "[35, 50)", "X ≥ 50"
+        ]
+    ),
+    "dl_throughput": (
+        [-np.inf, 0, 1000, 3000, 5000, 10000, np.inf],
+        [
+            "X < 0", "[0, 1000)", "[1000, 3000)", "[3000, 5000)",
+            "[5000, 10000)", "X ≥ 10000"
+        ],
+    ),
+    "ul_throughput_mb": (
+        [-np.inf, 0, 1000, 3000, 5000, 10000, np.inf],
+        [
+            "X < 0", "[0, 1000)", "[1000, 3000)", "[3000, 5000)",
+            "[5000, 10000)", "X ≥ 10000"
+        ],
+    ),
+}
+
+
+def kpi_hist_frame(
+    siteid_cellids: List[str],
+    query_date: date,
+    conn: Connection,
+) -> pd.DataFrame:
+    """
+    Return `siteid_cellid, kpi, bin, count` for the given cells / day
+    (empty frame when the cube has no rows for them).
+    """
+    stmt = (
+        select(kpi_hist.c.siteid_cellid, kpi_hist.c.kpi, kpi_hist.c.bin, kpi_hist.c.count)
+        .where(
+            kpi_hist.c.siteid_cellid.in_(siteid_cellids),
+            kpi_hist.c.date == query_date,
+        )
+    )
+    result = conn.execute(stmt)
+    return pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Column, Date, Double, MetaData, Numeric, Table, Text
+from sqlalchemy import BigInteger, Column, Date, Double, MetaData, Numeric, SmallInteger, Table, Text
 from sqlalchemy.orm.base import Mapped
 
 metadata = MetaData()
@@ -55,3 +55,16 @@ kpi_data = Table(
     Column('total_traffic_mb', Double(53)),
     schema='public'
 )
+
+
+# (date, cell, kpi, bin) → sample count – filled by the all_data insert
+# trigger, read by SSV4G.make_tables (bins live in database/kpi_hist.py)
+kpi_hist = Table(
+    'kpi_hist', metadata,
+    Column('date', Date, primary_key=True),
+    Column('siteid_cellid', Text, primary_key=True),
+    Column('kpi', Text, primary_key=True),
+    Column('bin', SmallInteger, primary_key=True),
+    Column('count', BigInteger, nullable=False),
+    schema='public'
+)
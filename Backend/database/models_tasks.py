@@ -2,7 +2,7 @@
 from __future__ import annotations
 from datetime import datetime, date, timezone
 from sqlalchemy import (
-    Integer, String, DateTime, Date, Text, ForeignKey, JSON
+    Integer, String, DateTime, Date, Text, ForeignKey, JSON, ColumnElement, case
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -21,17 +21,36 @@ class TaskGroup(Base):
     )
     status:   Mapped[str]       = mapped_column(String(100), default="queued")
 
+    # item counters, kept by ssv_task_service._advance_group (UPDATE … RETURNING)
+    total:    Mapped[int]       = mapped_column(Integer, default=0, server_default="0")
+    ok:       Mapped[int]       = mapped_column(Integer, default=0, server_default="0")
+    error:    Mapped[int]       = mapped_column(Integer, default=0, server_default="0")
+    running:  Mapped[int]       = mapped_column(Integer, default=0, server_default="0")
+
     items: Mapped[list["TaskItem"]] = relationship(
         back_populates="group", cascade="all, delete-orphan"
     )
 
-    # handy aggregate view
+    # handy aggregate view – from the counters, so neither form touches items
     @hybrid_property
     def percent_done(self) -> float:
-        if not self.items:
+        if not self.total:
             return 0.0
-        done = sum(1 for i in self.items if i.status == "SUCCESS")
-        return done / len(self.items) * 100
+        return ((self.ok or 0) + (self.error or 0)) / self.total * 100
+
+    @percent_done.inplace.expression
+    @classmethod
+    def _percent_done_expression(cls) -> ColumnElement[float]:
+        return case((cls.total > 0, (cls.ok + cls.error) * 100.0 / cls.total), else_=0.0)
+
+    @hybrid_property
+    def queued(self) -> int:
+        return (self.total or 0) - (self.ok or 0) - (self.error or 0) - (self.running or 0)
+
+    @queued.inplace.expression
+    @classmethod
+    def _queued_expression(cls) -> ColumnElement[int]:
+        return cls.total - cls.ok - cls.error - cls.running
 
 
 # ──────────────────────────────────────────────────────────
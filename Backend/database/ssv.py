@@ -1,7 +1,9 @@
 from database.db import NotFoundError
 from .models import kpi_data,celldb,all_data
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select,distinct,cast, String
+from sqlalchemy.engine import Connection, Result
+from sqlalchemy import select,distinct,cast, String, Double, func, literal, union_all, or_
+import pandas as pd
 
 from datetime import date
 from typing import Sequence, Mapping, Any, List
@@ -19,9 +21,17 @@ async def site_kpi(
     For an underscore separator the LIKE pattern is '123456\\_%'
     (the back-slash escapes the underscore, which is a single-char wildcard in SQL).
     """
+    result = await db.execute(_site_kpi_stmt(siteid, query_date))
+    rows = result.mappings().all()
+
+    if not rows:
+        raise NotFoundError(f"No KPI data for site {siteid} on {query_date}")
+    return rows
+
+def _site_kpi_stmt(siteid: str, query_date: date):
     pattern = f"{siteid}-%"        # 100046-%
 
-    stmt = (
+    return (
         select(kpi_data)
         .where(
             kpi_data.c.siteid_cellid.like(pattern),
@@ -30,13 +40,6 @@ async def site_kpi(
         .order_by(kpi_data.c.siteid_cellid.asc())
     )
 
-    result = await db.execute(stmt)
-    rows = result.mappings().all()
-
-    if not rows:
-        raise NotFoundError(f"No KPI data for site {siteid} on {query_date}")
-    return rows
-
 async def site_kpi_by_list(
     siteid_cellids: List[str],                      # site id
     query_date: date,
@@ -108,25 +111,32 @@ async def site_info(
     Return every distinct `siteid_cellid` that belongs to one site
     together with site-level latitude / longitude / azimuth.
     """
-    stmt = (
+    result = await db.execute(_site_info_stmt(siteid))
+    rows = result.mappings().all()             # RowMapping → dict-like rows
+
+    if not rows:
+        raise NotFoundError(f"No cells for site {siteid}")
+
+    return rows 
+
+def _site_info_stmt(siteid: int):
+    return _sites_info_stmt([siteid])
+
+def _sites_info_stmt(siteids: List[int]):
+    # latest celldb row per cell – the same base-station anchor as _grid_stmt
+    return (
         select(
-            distinct(celldb.c.siteid_cellid),  # DISTINCT on this column
+            celldb.c.siteid_cellid,
             celldb.c.siteid,
             celldb.c.latitude,
             celldb.c.longitude,
             celldb.c.azimuth,
             celldb.c.beamwidth,
         )
-        .where(celldb.c.siteid == siteid)
+        .where(celldb.c.siteid.in_(siteids))
+        .distinct(celldb.c.siteid_cellid)      # DISTINCT ON (siteid_cellid)
+        .order_by(celldb.c.siteid_cellid, celldb.c.date.desc())
     )
-
-    result = await db.execute(stmt)
-    rows = result.mappings().all()             # RowMapping → dict-like rows
-
-    if not rows:
-        raise NotFoundError(f"No cells for site {siteid}")
-
-    return rows 
 '''
 ALL DATA
 '''
@@ -164,7 +174,42 @@ async def all_data_by_list(
     """
     Return the `siteid` values whose text form begins with <prefix>.
     """
-    stmt = (
+    result = await db.execute(_all_data_by_list_stmt(siteid_cellids, query_date))
+    rows = result.mappings().all()           # RowMapping → dict-like rows
+
+    if not rows:
+        raise NotFoundError(
+            f"No all_data rows for {siteid_cellids} on {query_date}"
+        )
+    return rows
+
+async def all_data_columns_by_list(
+    siteid_cellids: List[str],
+    query_date: date,
+    db: AsyncSession,
+) -> tuple[list[str], Sequence[tuple]]:
+    """
+    Same rows as `all_data_by_list` but as plain tuples + column names, with
+    the Numeric(9, 6) coordinates cast to float8 in SQL – feeds the columnar
+    (Arrow) response without any per-row Python conversion.
+    """
+    cols = [
+        cast(c, Double).label(c.name) if c.name in _NUMERIC_COLS else c
+        for c in all_data.c
+    ]
+    stmt = _all_data_by_list_stmt(siteid_cellids, query_date).with_only_columns(*cols)
+
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    if not rows:
+        raise NotFoundError(
+            f"No all_data rows for {siteid_cellids} on {query_date}"
+        )
+    return list(result.keys()), rows
+
+def _all_data_by_list_stmt(siteid_cellids: List[str], query_date: date):
+    return (
         select(all_data)
         .where(
             all_data.c.siteid_cellid.in_(siteid_cellids),
@@ -173,11 +218,183 @@ async def all_data_by_list(
         .order_by(all_data.c.siteid_cellid)           # optional
     )
 
-    result = await db.execute(stmt)
-    rows = result.mappings().all()           # RowMapping → dict-like rows
+'''
+GRID – 50 m squares in EPSG:3857, aggregated in SQL
+'''
+GRID_KPIS = ("rsrp", "rsrq", "rssinr", "dl_throughput", "ul_throughput_mb")
+_EARTH_R = 6378137.0                     # Web-Mercator sphere radius (m)
+
+def _merc_x(lon):
+    return _EARTH_R * func.radians(cast(lon, Double))
+
+def _merc_y(lat):
+    return _EARTH_R * func.ln(func.tan(func.pi() / 4.0 + func.radians(cast(lat, Double)) / 2.0))
+
+def _grid_stmt(
+    siteid_cellids: List[str],
+    query_date: date,
+    kpis: Sequence[str],
+    grid_size: float,
+):
+    """
+    Samples are projected to Web-Mercator and snapped to a *grid_size* grid
+    anchored at the cell's base station (same snapping as the plotter):
+        x = bs_x + grid_size * round((sample_x - bs_x) / grid_size)
+    """
+    grid_size = float(grid_size)
+    # latest celldb row per cell → base-station position
+    bs = (
+        select(celldb.c.siteid_cellid, celldb.c.longitude, celldb.c.latitude)
+        .where(celldb.c.siteid_cellid.in_(siteid_cellids))
+        .distinct(celldb.c.siteid_cellid)
+        .order_by(celldb.c.siteid_cellid, celldb.c.date.desc())
+        .subquery("bs")
+    )
+    bs_x, bs_y = _merc_x(bs.c.longitude), _merc_y(bs.c.latitude)
+
+    selects = []
+    for kpi in kpis:
+        val = all_data.c[kpi]
+        snapped = (
+            select(
+                all_data.c.siteid_cellid,
+                bs_x.label("bs_x"),
+                bs_y.label("bs_y"),
+                func.round((_merc_x(all_data.c.longitude) - bs_x) / grid_size).label("ix"),
+                func.round((_merc_y(all_data.c.latitude) - bs_y) / grid_size).label("iy"),
+                val.label("val"),
+            )
+            .join(bs, bs.c.siteid_cellid == all_data.c.siteid_cellid)
+            .where(
+                all_data.c.siteid_cellid.in_(siteid_cellids),
+                all_data.c.date == query_date,
+                all_data.c.longitude.is_not(None),
+                all_data.c.latitude.is_not(None),
+                val.is_not(None),
+                val != cast(literal("NaN"), Double),
+            )
+            .subquery(f"snapped_{kpi}")
+        )
+        selects.append(
+            select(
+                snapped.c.siteid_cellid,
+                literal(kpi).label("kpi"),
+                (snapped.c.bs_x + snapped.c.ix * grid_size).label("x"),
+                (snapped.c.bs_y + snapped.c.iy * grid_size).label("y"),
+                func.count().label("count"),
+                func.avg(snapped.c.val).label("mean"),
+                func.percentile_cont(0.5).within_group(snapped.c.val).label("median"),
+                func.percentile_cont(0.1).within_group(snapped.c.val).label("p10"),
+            )
+            .group_by(snapped.c.siteid_cellid, snapped.c.bs_x, snapped.c.bs_y,
+                      snapped.c.ix, snapped.c.iy)
+        )
+    return union_all(*selects)
+
+async def grid_by_list(
+    siteid_cellids: List[str],
+    query_date: date,
+    db: AsyncSession,
+    *,
+    kpis: Sequence[str] = GRID_KPIS,
+    grid_size: float = 50,
+) -> Sequence[Mapping[str, Any]]:
+    """
+    Return one row per (cell, KPI, grid square):
+    `siteid_cellid, kpi, x, y, count, mean, median, p10`  (x / y in EPSG:3857).
+    """
+    result = await db.execute(_grid_stmt(siteid_cellids, query_date, kpis, grid_size))
+    rows = result.mappings().all()
 
     if not rows:
         raise NotFoundError(
             f"No all_data rows for {siteid_cellids} on {query_date}"
         )
-    return rows
\ No newline at end of file
+    return rows
+
+'''
+SYNC – DataFrames straight from the cursor (Celery worker, no HTTP hop)
+'''
+# Numeric(9, 6) columns come back as Decimal → turn them into float64 once
+_NUMERIC_COLS = ("longitude", "latitude")
+
+def _frame_from_result(result: Result) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+    for col in _NUMERIC_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("float64")
+    return df
+
+def site_info_frame(siteid: int, conn: Connection) -> pd.DataFrame:
+    """
+    Same rows as `site_info`, as a DataFrame.
+    """
+    df = _frame_from_result(conn.execute(_site_info_stmt(siteid)))
+    if df.empty:
+        raise NotFoundError(f"No cells for site {siteid}")
+    return df
+
+def site_kpi_frame(siteid: str, query_date: date, conn: Connection) -> pd.DataFrame:
+    """
+    Same rows as `site_kpi`, as a DataFrame.
+    """
+    df = _frame_from_result(conn.execute(_site_kpi_stmt(siteid, query_date)))
+    if df.empty:
+        raise NotFoundError(f"No KPI data for site {siteid} on {query_date}")
+    return df
+
+def all_data_frame(
+    siteid_cellids: List[str],
+    query_date: date,
+    conn: Connection,
+) -> pd.DataFrame:
+    """
+    Same rows as `all_data_by_list`, as a DataFrame.
+    """
+    df = _frame_from_result(conn.execute(_all_data_by_list_stmt(siteid_cellids, query_date)))
+    if df.empty:
+        raise NotFoundError(
+            f"No all_data rows for {siteid_cellids} on {query_date}"
+        )
+    return df
+
+def grid_frame(
+    siteid_cellids: List[str],
+    query_date: date,
+    conn: Connection,
+    *,
+    kpis: Sequence[str] = GRID_KPIS,
+    grid_size: float = 50,
+) -> pd.DataFrame:
+    """
+    Same rows as `grid_by_list`, as a DataFrame.
+    """
+    df = _frame_from_result(conn.execute(_grid_stmt(siteid_cellids, query_date, kpis, grid_size)))
+    if df.empty:
+        raise NotFoundError(
+            f"No all_data rows for {siteid_cellids} on {query_date}"
+        )
+    return df
+
+'''
+SYNC – set-based, many sites at once (group prefetch)
+'''
+def sites_info_frame(siteids: List[int], conn: Connection) -> pd.DataFrame:
+    """
+    `site_info` rows of every site in *siteids* (empty frame if none match).
+    """
+    return _frame_from_result(conn.execute(_sites_info_stmt(siteids)))
+
+def sites_kpi_frame(siteids: List[str], query_date: date, conn: Connection) -> pd.DataFrame:
+    """
+    `site_kpi` rows of every site in *siteids* – same '<siteid>-%' match.
+    """
+    stmt = (
+        select(kpi_data)
+        .where(
+            or_(*[kpi_data.c.siteid_cellid.like(f"{siteid}-%") for siteid in siteids]),
+            kpi_data.c.date == query_date,
+        )
+        .order_by(kpi_data.c.siteid_cellid.asc())
+    )
+    return _frame_from_result(conn.execute(stmt))
@@ -4,6 +4,7 @@ Async helpers  → used by FastAPI routes
 Sync  helpers  → used by Celery worker threads
 """
 from __future__ import annotations
+import logging
 from typing import NamedTuple
 from infrustructure.notifier import notify_ws
 
@@ -12,7 +13,7 @@ from datetime import datetime, timezone
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import case, func, select
+from sqlalchemy import case, select, update
 from sqlalchemy.orm import selectinload
 
 from database.db import async_session, SessionLocal            # ← BOTH stacks
@@ -20,8 +21,9 @@ from database.models_tasks import TaskGroup, TaskItem, SSVTask
 from database.status import ItemStatus, GroupStatus
 
 from infrustructure.ws_bus import bus
-from .result_archiver import ResultArchiver
-from tasks.mutex_lock import lock 
+from celery_app import celery_app
+
+log = logging.getLogger("ssv.tasks")
 
 # ──────────────────────────────────────────────────────────
 #  ASYNC PART  (FastAPI)
@@ -32,7 +34,7 @@ async def create_ssv_batch(
     """
     *sites* = list of {"site_id": "...", "date": "...", "tech": "..."}
     """
-    group = TaskGroup(username=username, status="queued")
+    group = TaskGroup(username=username, status="queued", total=len(sites))
     db.add(group)
     await db.flush()  # assign group.id
 
@@ -42,6 +44,7 @@ async def create_ssv_batch(
             site_id=site["site_id"],
             site_date=site["date"],
             tech=site.get("tech", "LTE"),
+            payload={"grid_mode": site["grid_mode"]} if site.get("grid_mode") else {},
         )
         for site in sites
     ]
@@ -114,76 +117,129 @@ def session_scope() -> Session:
         db.close()
 
 
-def _recalc_group_status(db: Session, group_id: int) -> None:
+# item status → TaskGroup counter column
+_COUNTER = {ItemStatus.RUNNING: "running", ItemStatus.OK: "ok", ItemStatus.ERROR: "error"}
+
+
+def _group_status(total: int, ok: int, error: int, running: int) -> str:
+    """Python twin of the CASE in _advance_group (used for the status before it)."""
+    if total > 0 and ok + error == total:
+        return GroupStatus.DONE if ok else GroupStatus.ERROR
+    return GroupStatus.RUNNING if ok + error + running else GroupStatus.QUEUED
+
+
+def _advance_group(db: Session, group_id: int, previous: str | None, status: str) -> str | None:
+    """
+    Move one item of *group_id* from *previous* to *status* in the group
+    counters – one UPDATE … RETURNING, no Python lock.  Postgres serialises
+    the row update across processes and hosts, so exactly one item sees the
+    group become DONE / ERROR.  Returns the new group status **only when**
+    it changed; the caller emits the websocket event (after the commit).
     """
-    Re-evaluate a group *after* one child finishes.
-    Emits websocket events **only when** the parent status changes.
+    delta = dict.fromkeys(_COUNTER.values(), 0)
+    if previous in _COUNTER:
+        delta[_COUNTER[previous]] -= 1
+    if status in _COUNTER:
+        delta[_COUNTER[status]] += 1
+    if not any(delta.values()):
+        return None
+
+    ok = TaskGroup.ok + delta["ok"]
+    error = TaskGroup.error + delta["error"]
+    running = TaskGroup.running + delta["running"]
+    finished = (TaskGroup.total > 0) & (ok + error == TaskGroup.total)
+    row = db.execute(
+        update(TaskGroup)
+        .where(TaskGroup.id == group_id)
+        .values(ok=ok, error=error, running=running,
+                status=case((finished & (ok > 0), GroupStatus.DONE.value),
+                            (finished, GroupStatus.ERROR.value),
+                            else_=GroupStatus.RUNNING.value))
+        .returning(TaskGroup.username, TaskGroup.status, TaskGroup.total,
+                   TaskGroup.ok, TaskGroup.error, TaskGroup.running)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    if row is None:
+        return None
+
+    before = _group_status(row.total, row.ok - delta["ok"], row.error - delta["error"],
+                           row.running - delta["running"])
+    return row.status if row.status != before else None
+
+
+def _after_group_change(group_id: int, status: str | None) -> None:
     """
-    totals_q = (
-        select(
-            func.count().label("total"),
-            func.sum(case((TaskItem.status == ItemStatus.OK, 1), else_=0)).label("ok"),
-            func.sum(case((TaskItem.status == ItemStatus.ERROR, 1), else_=0)).label("err"),
-        ).where(TaskItem.group_id == group_id)
-    )
-
-    total, ok_cnt, err_cnt = db.execute(totals_q).one()
-    finished = total > 0 and (ok_cnt + err_cnt) == total
-
-    grp: TaskGroup | None = db.get(TaskGroup, group_id)
-    if grp is None:
+    Runs after the item's transaction committed (group row lock released).
+    DONE hands the group to finalize_ssv_group – workbook assembly + zip in
+    its own task and time limit; that task announces DONE once the zip exists.
+    """
+    if status == GroupStatus.DONE:
+        celery_app.send_task("tasks.ssv_worker.finalize_ssv_group", args=(group_id,),
+                             queue="ssv_report")
+    elif status is not None:
+        notify_group_sync(group_id)
+
+
+def notify_group_sync(group_id: int) -> None:
+    """Emit task_group_status with the group's current status and counters."""
+    with session_scope() as db:
+        row = db.execute(
+            select(TaskGroup.username, TaskGroup.status, TaskGroup.total,
+                   TaskGroup.ok, TaskGroup.error, TaskGroup.running)
+            .where(TaskGroup.id == group_id)
+        ).one_or_none()
+    if row is None:
         return
+    event = {"group_id": group_id, "status": row.status.lower(),
+             "total": row.total, "ok": row.ok, "error": row.error, "running": row.running}
+    notify_ws("broadcast", "task_group_status", event)     # 🔔 broadcast once
+    notify_ws(f"user:{row.username}", "task_group_status", event)
 
-    previous = grp.status
-
-    if finished:
-        if ok_cnt:
-            grp.status = GroupStatus.DONE
-            if previous != GroupStatus.DONE:           # first time → create zip
-                    ResultArchiver().archive_group(group_id)
-        else:
-            grp.status = GroupStatus.ERROR
-    else:
-        grp.status = GroupStatus.RUNNING
-        print("running")
-        notify_ws("broadcast", "task_group_status", {"group_id": grp.id, "status": grp.status.lower()})
-        notify_ws(f"user:{grp.username}", "task_group_status", {"group_id": grp.id, "status": grp.status.lower()})
-            # notify_ws("broadcast", "task_group_status", {...})
-    if grp.status != previous:                         # 🔔 broadcast once
-        new_stat = grp.status.lower()
-        print("abc")
-        notify_ws("broadcast", "task_group_status", {"group_id": grp.id, "status": new_stat})
-        notify_ws(f"user:{grp.username}", "task_group_status", {"group_id": grp.id, "status": new_stat})
+
+def fail_group_sync(group_id: int) -> None:
+    """Finalising a DONE group failed – nothing downloadable, the group is ERROR."""
+    with session_scope() as db:
+        db.execute(update(TaskGroup).where(TaskGroup.id == group_id)
+                   .values(status=GroupStatus.ERROR.value)
+                   .execution_options(synchronize_session=False))
+    notify_group_sync(group_id)
+
+
+def _set_item_status(db: Session, item_id: int, status: str, **values) -> tuple[TaskItem, str] | None:
+    """(item, previous status) – the item row is locked until the session commits."""
+    item: TaskItem | None = db.get(TaskItem, item_id, with_for_update=True)
+    if not item:
+        return None
+    previous = item.status
+    item.status = status
+    for name, value in values.items():
+        setattr(item, name, value)
+    db.flush()  # push changes before we emit
+    return item, previous
 
 
 # ────────────────────────────────────────────────────────────────
 def mark_started_sync(item_id: int, celery_uuid: str) -> None:
     """Called *inside the Celery thread-pool* when an item really starts."""
     with session_scope() as db:
-        item: TaskItem | None = db.get(TaskItem, item_id)
-        if not item:
+        changed = _set_item_status(db, item_id, ItemStatus.RUNNING, celery_uuid=celery_uuid)
+        if not changed:
             return
-
-        item.status = ItemStatus.RUNNING
-        item.celery_uuid = celery_uuid
-
-        grp: TaskGroup = db.get(TaskGroup, item.group_id)
-        if grp.status != GroupStatus.RUNNING:
-            grp.status = GroupStatus.RUNNING
-
-        db.flush()  # push changes before we emit
+        item, previous = changed
+        username = db.scalar(select(TaskGroup.username).where(TaskGroup.id == item.group_id))
 
         # ── websocket events ────────────────────────────────────
         notify_ws("broadcast", "task_item_started", {
             "item_id": item.id,
             "status": item.status
         })
-        notify_ws(f"user:{grp.username}", "task_item_started", {
+        notify_ws(f"user:{username}", "task_item_started", {
             "item_id": item.id,
             "status": item.status
         })
-        with lock:
-            _recalc_group_status(db, grp.id)
+        group_id = item.group_id
+        group_status = _advance_group(db, group_id, previous, item.status)
+    _after_group_change(group_id, group_status)
 
 
 
@@ -191,31 +247,30 @@ def mark_started_sync(item_id: int, celery_uuid: str) -> None:
 def mark_done_sync(item_id: int, ok: bool, result: str) -> None:
     """Called from the Celery worker thread after the script finishes."""
     with session_scope() as db:
-        item: TaskItem | None = db.get(TaskItem, item_id)
-        if not item:
+        changed = _set_item_status(db, item_id, ItemStatus.OK if ok else ItemStatus.ERROR,
+                                   result=result)
+        if not changed:
             return
-
-        item.status = ItemStatus.OK if ok else ItemStatus.ERROR
-        item.result = result
-
-        db.flush()
+        item, previous = changed
+        username = db.scalar(select(TaskGroup.username).where(TaskGroup.id == item.group_id))
 
         status_str = item.status.lower()
 
         # ── websocket events for the *item* ─────────────────────
-        grp: TaskGroup = db.get(TaskGroup, item.group_id)
-        print(status_str)
         notify_ws("broadcast", "task_item_finished", {"item_id": item.id, "status": status_str})
-        notify_ws(f"user:{grp.username}", "task_item_finished", {"item_id": item.id, "status": status_str})
-        # ── update / broadcast the *group* if needed ────────────
-        with lock:
-            _recalc_group_status(db, grp.id)
+        notify_ws(f"user:{username}", "task_item_finished", {"item_id": item.id, "status": status_str})
+        # ── update the *group* counters ─────────────────────────
+        group_id = item.group_id
+        group_status = _advance_group(db, group_id, previous, item.status)
+    # ── broadcast / finalise the *group* once committed ─────────
+    _after_group_change(group_id, group_status)
 
 class SSVArgs(NamedTuple):
     group_id: int
     site_id: str
     date:    str     # or datetime.date if you store it as DATE
     tech:    str
+    grid_mode: str | None = None    # per-report map mode (TaskItem.payload)
 
 def get_ssv_args_sync(item_id: int) -> SSVArgs:
     """
@@ -224,5 +279,39 @@ def get_ssv_args_sync(item_id: int) -> SSVArgs:
     """
     with session_scope() as db:               # ← same sync session helper
         item: SSVTask = db.get(SSVTask, item_id)
-        return SSVArgs(item.group_id, item.site_id, item.site_date, item.tech)
+        return SSVArgs(item.group_id, item.site_id, item.site_date, item.tech,
+                       (item.payload or {}).get("grid_mode"))
     
+
+
+def get_group_ssv_args_sync(group_id: int) -> list[tuple[int, SSVArgs]]:
+    """
+    (item_id, SSVArgs) for every item of a group – one query, used by the
+    group prefetch before the items are dispatched.
+    """
+    with session_scope() as db:
+        items = db.scalars(
+            select(SSVTask).where(SSVTask.group_id == group_id).order_by(SSVTask.id)
+        ).all()
+        return [
+            (item.id, SSVArgs(item.group_id, item.site_id, item.site_date, item.tech,
+                              (item.payload or {}).get("grid_mode")))
+            for item in items
+        ]
+
+
+def get_group_item_ids_sync(group_id: int) -> list[int]:
+    """Item ids of a group, in creation order – nothing else loaded."""
+    with session_scope() as db:
+        return list(db.scalars(
+            select(TaskItem.id).where(TaskItem.group_id == group_id).order_by(TaskItem.id)
+        ))
+
+
+def set_celery_ids_sync(celery_ids: dict[int, str]) -> None:
+    """{item_id: celery task id} → one executemany UPDATE, before the tasks are sent."""
+    if not celery_ids:
+        return
+    with session_scope() as db:
+        db.execute(update(TaskItem),
+                   [{"id": item_id, "celery_uuid": tid} for item_id, tid in celery_ids.items()])
@@ -0,0 +1,107 @@
+# Backend/infrustructure/arrow_stream.py
+"""
+Columnar Arrow IPC responses.
+
+Server side  – `accepts_arrow(request)` + `arrow_response(...)` turn plain DB
+               row tuples into Arrow record batches (column-wise, no Pydantic,
+               no JSON) and stream them as  application/vnd.apache.arrow.stream
+Client side  – `read_arrow_frame(content)` rebuilds a DataFrame from the
+               response body without copying the Arrow buffers.
+
+pyarrow is optional: without it the routes keep answering JSON and the
+client never asks for Arrow.
+"""
+from __future__ import annotations
+
+import io
+from typing import Iterator, Sequence
+
+import pandas as pd
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+try:
+    import pyarrow as pa
+except ImportError:                       # JSON-only installation
+    pa = None
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+BATCH_ROWS   = 50_000                     # rows per record batch
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def accepts_arrow(request: Request | None) -> bool:
+    """True when the client listed the Arrow stream type in its Accept header."""
+    if pa is None or request is None:
+        return False
+    return ARROW_STREAM in request.headers.get("accept", "")
+
+
+# ──────────────────────────────────────────────────────────
+# server
+# ──────────────────────────────────────────────────────────
+def _record_batches(
+    columns: list[str], rows: Sequence[tuple], schema: "pa.Schema", batch_rows: int
+) -> Iterator["pa.RecordBatch"]:
+    for start in range(0, len(rows), batch_rows):
+        chunk = rows[start:start + batch_rows]
+        arrays = [
+            pa.array(values, type=schema.field(name).type)
+            for name, values in zip(columns, zip(*chunk))   # rows → columns
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _ipc_stream(
+    columns: list[str], rows: Sequence[tuple], schema: "pa.Schema", batch_rows: int
+) -> Iterator[bytes]:
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in _record_batches(columns, rows, schema, batch_rows):
+            writer.write_batch(batch)
+            yield sink.getvalue()         # schema message + one batch
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()                 # end-of-stream marker
+
+
+def arrow_response(
+    columns: list[str],
+    rows: Sequence[tuple],
+    schema: "pa.Schema",
+    *,
+    batch_rows: int = BATCH_ROWS,
+) -> StreamingResponse:
+    return StreamingResponse(
+        _ipc_stream(columns, rows, schema, batch_rows), media_type=ARROW_STREAM
+    )
+
+
+# ──────────────────────────────────────────────────────────
+# client
+# ──────────────────────────────────────────────────────────
+def read_arrow_frame(content: bytes) -> pd.DataFrame:
+    table = pa.ipc.open_stream(pa.py_buffer(content)).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+# ──────────────────────────────────────────────────────────
+# schemas – mirror database/models.py
+# ──────────────────────────────────────────────────────────
+ALL_DATA_SCHEMA = pa.schema([
+    ("date",             pa.date32()),
+    ("siteid_cellid",    pa.string()),
+    ("rsrp",             pa.float64()),
+    ("rsrq",             pa.float64()),
+    ("rssinr",           pa.float64()),
+    ("fail",             pa.int64()),
+    ("block",            pa.int64()),
+    ("dl_throughput",    pa.float64()),
+    ("ul_throughput_mb", pa.float64()),
+    ("total_traffic_mb", pa.float64()),
+    ("longitude",        pa.float64()),
+    ("latitude",         pa.float64()),
+]) if pa is not None else None
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Response #,Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 # from sqlalchemy import select
 # from sqlalchemy.ext.asyncio import AsyncSession
@@ -44,6 +45,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1000)   # big /ssv payloads
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -0,0 +1,52 @@
+"""task group counters
+
+Revision ID: 5b9e0d7c41a2
+Revises: c18a3e85763d
+Create Date: 2026-10-17 14:02:19.538210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e0d7c41a2'
+down_revision: Union[str, Sequence[str], None] = 'c18a3e85763d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = ("total", "ok", "error", "running")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name in COUNTERS:
+        op.add_column('task_groups',
+                      sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    # backfill from the items already there (ItemStatus values)
+    op.execute("""
+        UPDATE task_groups AS g
+        SET total   = c.total,
+            ok      = c.ok,
+            error   = c.error,
+            running = c.running
+        FROM (
+            SELECT group_id,
+                   count(*)                                 AS total,
+                   count(*) FILTER (WHERE status = 'ok')      AS ok,
+                   count(*) FILTER (WHERE status = 'error')   AS error,
+                   count(*) FILTER (WHERE status = 'running') AS running
+            FROM task_items
+            GROUP BY group_id
+        ) AS c
+        WHERE c.group_id = g.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in reversed(COUNTERS):
+        op.drop_column('task_groups', name)
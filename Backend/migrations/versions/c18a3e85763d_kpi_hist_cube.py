@@ -0,0 +1,92 @@
+"""kpi histogram cube
+
+Revision ID: c18a3e85763d
+Revises: 4272d9b99997
+Create Date: 2026-10-17 10:12:41.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c18a3e85763d'
+down_revision: Union[str, Sequence[str], None] = '4272d9b99997'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# inner bin edges – frozen copy of database/kpi_hist.py:KPI_BINS at this revision
+INNER_EDGES = {
+    "rsrp":             [-141, -120, -110, -100, -95, -90, -80, -70, -44],
+    "rsrq":             [-20, -18, -12, -10, -6, -3],
+    "rssinr":           [-20, -10, 0, 15, 25, 35, 50],
+    "dl_throughput":    [0, 1000, 3000, 5000, 10000],
+    "ul_throughput_mb": [0, 1000, 3000, 5000, 10000],
+}
+
+
+def _binned_rows(source: str) -> str:
+    """SELECT date, cell, kpi, bin, count(*) over every KPI column of *source*."""
+    values = ",\n            ".join(
+        f"('{kpi}', CASE WHEN s.{kpi} <> 'NaN'::float8 THEN "
+        f"width_bucket(s.{kpi}, ARRAY{edges}::float8[]) END)"
+        for kpi, edges in INNER_EDGES.items()
+    )
+    return f"""
+        SELECT s.date, s.siteid_cellid, v.kpi, v.bin, count(*)
+        FROM {source} AS s
+        CROSS JOIN LATERAL (VALUES
+            {values}
+        ) AS v(kpi, bin)
+        WHERE v.bin IS NOT NULL
+          AND s.date IS NOT NULL AND s.siteid_cellid IS NOT NULL
+        GROUP BY s.date, s.siteid_cellid, v.kpi, v.bin
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('kpi_hist',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('siteid_cellid', sa.Text(), nullable=False),
+    sa.Column('kpi', sa.Text(), nullable=False),
+    sa.Column('bin', sa.SmallInteger(), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'siteid_cellid', 'kpi', 'bin'),
+    schema='public'
+    )
+
+    # backfill from what is already in all_data
+    op.execute(
+        "INSERT INTO public.kpi_hist (date, siteid_cellid, kpi, bin, count)"
+        + _binned_rows("public.all_data")
+    )
+
+    # keep it current: every INSERT into all_data adds its rows' counts
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION public.kpi_hist_ingest() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO public.kpi_hist (date, siteid_cellid, kpi, bin, count)
+            {_binned_rows("new_rows")}
+            ON CONFLICT (date, siteid_cellid, kpi, bin)
+            DO UPDATE SET count = public.kpi_hist.count + EXCLUDED.count;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER all_data_kpi_hist
+        AFTER INSERT ON public.all_data
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.kpi_hist_ingest()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS all_data_kpi_hist ON public.all_data")
+    op.execute("DROP FUNCTION IF EXISTS public.kpi_hist_ingest()")
+    op.drop_table('kpi_hist', schema='public')
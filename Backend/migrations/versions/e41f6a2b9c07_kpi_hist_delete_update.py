@@ -0,0 +1,112 @@
+"""kpi_hist follows DELETE / UPDATE / TRUNCATE on all_data
+
+Revision ID: e41f6a2b9c07
+Revises: 5b9e0d7c41a2
+Create Date: 2026-10-17 16:21:07.904316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41f6a2b9c07'
+down_revision: Union[str, Sequence[str], None] = '5b9e0d7c41a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# inner bin edges – frozen copy of database/kpi_hist.py:KPI_BINS at this revision
+INNER_EDGES = {
+    "rsrp":             [-141, -120, -110, -100, -95, -90, -80, -70, -44],
+    "rsrq":             [-20, -18, -12, -10, -6, -3],
+    "rssinr":           [-20, -10, 0, 15, 25, 35, 50],
+    "dl_throughput":    [0, 1000, 3000, 5000, 10000],
+    "ul_throughput_mb": [0, 1000, 3000, 5000, 10000],
+}
+
+
+def _binned_rows(source: str) -> str:
+    """SELECT date, cell, kpi, bin, count(*) over every KPI column of *source*."""
+    values = ",\n            ".join(
+        f"('{kpi}', CASE WHEN s.{kpi} <> 'NaN'::float8 THEN "
+        f"width_bucket(s.{kpi}, ARRAY{edges}::float8[]) END)"
+        for kpi, edges in INNER_EDGES.items()
+    )
+    return f"""
+        SELECT s.date, s.siteid_cellid, v.kpi, v.bin, count(*)
+        FROM {source} AS s
+        CROSS JOIN LATERAL (VALUES
+            {values}
+        ) AS v(kpi, bin)
+        WHERE v.bin IS NOT NULL
+          AND s.date IS NOT NULL AND s.siteid_cellid IS NOT NULL
+        GROUP BY s.date, s.siteid_cellid, v.kpi, v.bin
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # removed rows take their counts back out; emptied bins disappear
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION public.kpi_hist_retract() RETURNS trigger AS $$
+        BEGIN
+            UPDATE public.kpi_hist AS h
+            SET count = h.count - d.count
+            FROM ({_binned_rows("old_rows")}) AS d(date, siteid_cellid, kpi, bin, count)
+            WHERE h.date = d.date AND h.siteid_cellid = d.siteid_cellid
+              AND h.kpi = d.kpi AND h.bin = d.bin;
+
+            DELETE FROM public.kpi_hist AS h
+            USING (SELECT DISTINCT date, siteid_cellid FROM old_rows) AS o
+            WHERE h.date = o.date AND h.siteid_cellid = o.siteid_cellid
+              AND h.count <= 0;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION public.kpi_hist_clear() RETURNS trigger AS $$
+        BEGIN
+            TRUNCATE public.kpi_hist;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute("""
+        CREATE TRIGGER all_data_kpi_hist_delete
+        AFTER DELETE ON public.all_data
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.kpi_hist_retract()
+    """)
+    # UPDATE = retract the old rows + ingest the new ones (kpi_hist_ingest from
+    # c18a3e85763d); a trigger may only reference one transition table per side
+    op.execute("""
+        CREATE TRIGGER all_data_kpi_hist_update_old
+        AFTER UPDATE ON public.all_data
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.kpi_hist_retract()
+    """)
+    op.execute("""
+        CREATE TRIGGER all_data_kpi_hist_update_new
+        AFTER UPDATE ON public.all_data
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.kpi_hist_ingest()
+    """)
+    op.execute("""
+        CREATE TRIGGER all_data_kpi_hist_truncate
+        AFTER TRUNCATE ON public.all_data
+        FOR EACH STATEMENT EXECUTE FUNCTION public.kpi_hist_clear()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for trigger in ("all_data_kpi_hist_truncate", "all_data_kpi_hist_update_new",
+                    "all_data_kpi_hist_update_old", "all_data_kpi_hist_delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON public.all_data")
+    op.execute("DROP FUNCTION IF EXISTS public.kpi_hist_clear()")
+    op.execute("DROP FUNCTION IF EXISTS public.kpi_hist_retract()")
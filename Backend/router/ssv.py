@@ -2,12 +2,16 @@ from fastapi import APIRouter,HTTPException,Request,Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import  Depends
 from database.db import NotFoundError,get_db
-from database.ssv import site_kpi,site_kpi_by_list,distinct_cells_for_site,siteids_starting_with,get_all_data,site_info,all_data_by_list
+from database.ssv import site_kpi,site_kpi_by_list,distinct_cells_for_site,siteids_starting_with,get_all_data,site_info,all_data_by_list,all_data_columns_by_list,grid_by_list,GRID_KPIS
+from infrustructure.arrow_stream import ALL_DATA_SCHEMA, accepts_arrow, arrow_response
 from .limiter import limiter
 from typing import List
 from datetime import date
-from schemas import KPISiteQueryParams, KPIData,KPISiteidCellidQueryParams,AllData,AllDataQueryParams
+from schemas import KPISiteQueryParams, KPIData,KPISiteidCellidQueryParams,AllData,AllDataQueryParams,GridQueryParams,GridCell
 from starlette.requests import Request as req
+from fastapi.responses import Response
+from tasks.SSV.grid_vector import GRID_COLUMNS, grid_geojson, dumps as geojson_dumps
+import pandas as pd
 import sys,logging,json
 
 
@@ -122,6 +126,7 @@ async def get_all_datas(
     except Exception as e:
         raise HTTPException(status_code=500,detail=f"Internal Server Error: {str(e)} ")
     
+#Accept: application/vnd.apache.arrow.stream → columnar Arrow IPC stream instead of JSON
 @router.get(
     "/get_all_data_by_list/",
     response_model=List[AllData],          # list → FastAPI handles JSON encode
@@ -135,6 +140,10 @@ async def get_all_data_by_list(
     
     
     try:
+        if accepts_arrow(request):
+            columns, rows = await all_data_columns_by_list(json.loads(params.siteid_cellids), params.date, db)
+            return arrow_response(columns, rows, ALL_DATA_SCHEMA)
+
         rows = await all_data_by_list(json.loads(params.siteid_cellids), params.date, db)
         
         return rows
@@ -142,4 +151,55 @@ async def get_all_data_by_list(
         raise HTTPException(status_code=404,detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500,detail=f"Internal Server Error: {str(e)} ")
-         
+
+#GET http://127.0.0.1:8000/ssv/grid_by_list/?siteid_cellids=["100046-121","100046-141"]&date=2025-01-01&kpi=rsrp
+@router.get(
+    "/grid_by_list/",
+    response_model=List[GridCell],
+)
+#@limiter.limit("1/second")
+async def get_grid_by_list(
+    params : GridQueryParams = Depends(),
+    request: Request  = None,        # keep if you need IP etc.
+    db: AsyncSession = Depends(get_db),
+):
+    if params.kpi is not None and params.kpi not in GRID_KPIS:
+        raise HTTPException(status_code=422,detail=f"kpi must be one of {list(GRID_KPIS)}")
+
+    try:
+        rows = await grid_by_list(
+            json.loads(params.siteid_cellids), params.date, db,
+            kpis=[params.kpi] if params.kpi else GRID_KPIS,
+            grid_size=params.grid_size,
+        )
+        return rows
+    except NotFoundError as e:
+        raise HTTPException(status_code=404,detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500,detail=f"Internal Server Error: {str(e)} ")
+
+#GET http://127.0.0.1:8000/ssv/grid_geojson/?siteid_cellids=["100046-121","100046-141"]&date=2025-01-01&kpi=rsrp
+# same squares as /grid_by_list, as a GeoJSON FeatureCollection (lon/lat polygons + legend)
+@router.get("/grid_geojson/")
+#@limiter.limit("1/second")
+async def get_grid_geojson(
+    params : GridQueryParams = Depends(),
+    request: Request  = None,        # keep if you need IP etc.
+    db: AsyncSession = Depends(get_db),
+):
+    if params.kpi is not None and params.kpi not in GRID_KPIS:
+        raise HTTPException(status_code=422,detail=f"kpi must be one of {list(GRID_KPIS)}")
+
+    try:
+        rows = await grid_by_list(
+            json.loads(params.siteid_cellids), params.date, db,
+            kpis=[params.kpi] if params.kpi else GRID_KPIS,
+            grid_size=params.grid_size,
+        )
+        collection = grid_geojson(pd.DataFrame([dict(r) for r in rows], columns=list(GRID_COLUMNS)),
+                                  params.grid_size)
+        return Response(content=geojson_dumps(collection), media_type="application/geo+json")
+    except NotFoundError as e:
+        raise HTTPException(status_code=404,detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500,detail=f"Internal Server Error: {str(e)} ")
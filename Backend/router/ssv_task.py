@@ -1,6 +1,6 @@
 # BACKEND/router/ssv_runner.py
 from datetime import date as dt
-from typing import List
+from typing import List, Literal
 
 from fastapi import APIRouter, Depends, status, HTTPException
 from pydantic import BaseModel, Field
@@ -10,7 +10,9 @@ from sqlalchemy import select
 from database.db import async_session,get_db
 from database.ssv_task_service import create_ssv_batch
 from database.models_tasks import TaskGroup, TaskItem
-from tasks.ssv_worker import process_one_item   # Celery task
+from tasks.ssv_worker import dispatch_ssv_group, prefetch_ssv_group   # Celery tasks
+from tasks.SSV.render_cache import get_render_store
+from config import settings
 
 
 
@@ -21,6 +23,9 @@ class SiteIn(BaseModel):
     site_id: str = Field(..., examples=["TR-456"])
     date: dt   = Field(..., examples=["2025-06-18"])
     tech: str | None = Field(None, examples=["LTE"])
+    # map colouring: every sample blended, or one aggregate per 50 m square
+    grid_mode: Literal["samples", "median", "mean", "p10", "count"] | None = Field(
+        None, examples=["median"])
 
 class BatchIn(BaseModel):
     username: str
@@ -31,6 +36,16 @@ class BatchOut(BaseModel):
     item_ids: List[int]
     percent_done: float
 
+class GroupProgressOut(BaseModel):
+    group_id: int
+    status: str
+    total: int
+    queued: int
+    running: int
+    ok: int
+    error: int
+    percent_done: float
+
 
 
 # ──────────────── POST /ssv/run ─────────────────────────────
@@ -50,9 +65,12 @@ async def run_batch(payload: BatchIn, db: AsyncSession = Depends(get_db)):
         db,
     )
     print("A")
-    # 2)  one Celery job per TaskItem
-    for item in group.items:
-        process_one_item.delay(item.id)
+    # 2)  one message for the whole group – a worker fans the items out
+    #     (group prefetch: fill the worker cache first, then queue the items)
+    if settings.SSV_GROUP_PREFETCH and settings.SSV_CACHE_ENABLED:
+        prefetch_ssv_group.delay(group.id)
+    else:
+        dispatch_ssv_group.delay(group.id)
     print("B")
     return BatchOut(
         group_id=group.id,
@@ -67,12 +85,43 @@ async def run_batch(payload: BatchIn, db: AsyncSession = Depends(get_db)):
     summary="Check batch progress",
 )
 async def batch_status(group_id: int, db: AsyncSession = Depends(get_db)):
-    q = await db.execute(select(TaskGroup).where(TaskGroup.id == group_id))
-    group = q.scalar_one_or_none()
-    if not group:
+    percent = await db.scalar(select(TaskGroup.percent_done).where(TaskGroup.id == group_id))
+    if percent is None:
         raise HTTPException(404, detail="Group not found")
+    item_ids = await db.scalars(
+        select(TaskItem.id).where(TaskItem.group_id == group_id).order_by(TaskItem.id)
+    )
     return BatchOut(
-        group_id=group.id,
-        item_ids=[i.id for i in group.items],
-        percent_done=group.percent_done,
+        group_id=group_id,
+        item_ids=list(item_ids),
+        percent_done=percent,
     )
+
+# ──────────────── GET /ssv_task/group/{id}/progress ─────────
+@router.get(
+    "/group/{group_id}/progress",
+    response_model=GroupProgressOut,
+    summary="Batch progress – counts by status, no items loaded",
+)
+async def batch_progress(group_id: int, db: AsyncSession = Depends(get_db)):
+    # one row of task_groups counters (kept by ssv_task_service._advance_group)
+    row = (await db.execute(
+        select(TaskGroup.status, TaskGroup.total, TaskGroup.queued, TaskGroup.running,
+               TaskGroup.ok, TaskGroup.error, TaskGroup.percent_done)
+        .where(TaskGroup.id == group_id)
+    )).one_or_none()
+    if row is None:
+        raise HTTPException(404, detail="Group not found")
+    return GroupProgressOut(group_id=group_id, status=row.status.lower(),
+                            total=row.total, queued=row.queued, running=row.running,
+                            ok=row.ok, error=row.error,
+                            percent_done=round(float(row.percent_done), 2))
+
+# ──────────────── GET /ssv_task/render_cache ────────────────
+@router.get(
+    "/render_cache",
+    summary="Hit / miss counters of the rendered-map cache",
+)
+async def render_cache_stats():
+    # counters live in the cache file, so this sees every worker process
+    return get_render_store().stats()
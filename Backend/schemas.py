@@ -57,3 +57,21 @@ class AllData(BaseModel):
 class AllDataQueryParams(BaseModel):
     siteid_cellid: str
     date: date
+
+
+# ── 3.  50 m grid aggregates (EPSG:3857) ────────────────────────────────
+class GridQueryParams(BaseModel):
+    siteid_cellids: str                       # JSON list, like /get_all_data_by_list
+    date: date
+    kpi: Optional[str] = None                 # None → every LTE KPI
+    grid_size: float = Field(50, gt=0, description="Square size in metres")
+
+class GridCell(BaseModel):
+    siteid_cellid: str
+    kpi:           str
+    x:             float = Field(..., description="Square centre, EPSG:3857")
+    y:             float = Field(..., description="Square centre, EPSG:3857")
+    count:         int
+    mean:          float
+    median:        float
+    p10:           float
@@ -1,22 +1,93 @@
 import numpy
 import numbers
 
+
+def bounds(key: str) -> tuple[float, float]:
+    """'low:high' → floats; '-' / '-INF' / 'inf' = -inf, '+' / '+INF' = +inf."""
+    low_s, high_s = key.split(':')
+    low_s, high_s = low_s.strip(' +').lower(), high_s.strip(' +').lower()
+    low  = float('-inf') if low_s in ('-', 'inf', '-inf') else float(low_s)
+    high = float('inf')  if high_s in ('', 'inf') else float(high_s)
+    return low, high
+
+
 class RangeDict(dict):
     """
     Dictionary for interval keys. Supports open-ended ranges with '+' for +inf, '-' for -inf.
     Example: '-100:-20', '-:0', '0:100', '100:+'
+
+    The keys are compiled once (on every change) into sorted edge arrays:
+    * lookup(values) → colour index per value (-1 = NaN / outside all ranges),
+      index into .colours, which follows the key order
+    * rd[number]     → colour, as before
+    Ranges are half-open [low, high) and must not overlap.
     """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compile()
+
+    def _compile(self):
+        edges = [bounds(k) for k in self.keys()]
+        self.colours = list(self.values())
+        order = numpy.argsort([low for low, _ in edges], kind='stable')
+        self._lows  = numpy.array([edges[i][0] for i in order], dtype=numpy.float64)
+        self._highs = numpy.array([edges[i][1] for i in order], dtype=numpy.float64)
+        self._index = numpy.asarray(order, dtype=numpy.int16)
+
+    # keep the compiled arrays in step with the dict
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._compile()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._compile()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._compile()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._compile()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._compile()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self._compile()
+        return value
+
+    def clear(self):
+        super().clear()
+        self._compile()
+
+    def __ior__(self, other):
+        super().__ior__(other)
+        self._compile()
+        return self
+
+    def lookup(self, values) -> numpy.ndarray:
+        """Vectorised: array of values → int16 colour index (-1 = no range)."""
+        vals = numpy.asarray(values, dtype=numpy.float64)
+        if not len(self._lows):
+            return numpy.full(vals.shape, -1, dtype=numpy.int16)
+        pos = numpy.searchsorted(self._lows, vals, side='right') - 1
+        safe = numpy.clip(pos, 0, None)
+        hit = (pos >= 0) & (vals < self._highs[safe])    # NaN compares False
+        return numpy.where(hit, self._index[safe], -1).astype(numpy.int16)
+
     def __getitem__(self, item):
         # ① recognise every real number – Python float/int AND NumPy scalars
-        if isinstance(item, numbers.Real):          # <-- replace old line
-            val = float(item)
-            for key, colour in self.items():
-                low_s, high_s = key.split(':')
-                low  = float('-inf') if low_s.strip(' +').lower() in ('-', 'inf') else float(low_s)
-                high = float('inf')  if high_s.strip(' +').lower() in ('+', 'inf') else float(high_s)
-                if low <= val < high:               # use < high to avoid overlap
-                    return colour
+        if isinstance(item, numbers.Real):
+            idx = int(self.lookup(item))
+            if idx >= 0:
+                return self.colours[idx]
         # fallback – let dict raise if someone really indexes with the string
         return super().__getitem__(item)
 
@@ -94,6 +165,16 @@ LTE_Ranges = {
     }),
 }
 
+# samples per 50 m square – the "count" grid mode
+COUNT_Ranges = RangeDict({
+    "1:2":       '#deebf7',
+    "2:5":       '#9ecae1',
+    "5:10":      '#6baed6',
+    "10:20":     '#3182bd',
+    "20:50":     '#08519c',
+    "50:+INF":   '#08306b',
+})
+
 # ── self-test -- run “python RangeDict.py” ───────────────────
 # if __name__ == "__main__":
 #     from RangeDict import LTE_Ranges
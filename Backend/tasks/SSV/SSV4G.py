@@ -3,23 +3,25 @@
 # print(CRS.from_epsg(3857))
 
 from datetime import date
-import json
-import requests
 import pandas as pd
 import numpy as np
-from pyproj import Transformer
 
-from .SpatialKPIDensity import SpatialKPIDensityPlot      # ← preferred
+from .SpatialKPIDensity import RENDER_PROFILES, GRID_AGGREGATES      # ← preferred
+from .render_pool import render_cells
+from .render_cache import render_cached
 from .RangeDict import LTE_Ranges,RangeDict
+from .data_source import SSVDataSource, HTTPSource
+from .data_cache import SiteDataCache
+from .projection import to_web_mercator
+from .grid_vector import GRID_COLUMNS, grid_from_samples, grid_geojson, dumps as geojson_dumps
+from database.kpi_hist import KPI_BINS
 
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-from openpyxl.drawing.image import Image as XLImage
-from openpyxl.chart import BarChart, Reference
-from openpyxl.chart.label import DataLabelList
+from .report_layout import SheetLayout, onepage_layout
+from .report_writer import make_report_writer
+from .group_workbook import SHEET_SUFFIX, save_sheet
 
 from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 import os
 
 
@@ -30,6 +32,53 @@ matplotlib.use("Agg", force=True)  # belt-and-suspenders
 import matplotlib.pyplot as plt
 plt.ioff()                         # disable interactive state
 
+# fetch stage – shared by every SSV4G in this worker process
+# (8 Celery threads × site-info + KPI in parallel)
+_fetch_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ssv-fetch")
+
+# ── compact sample schema + one-pass partition by cell ───────────────────
+_SAMPLE_KPIS = ("rsrp", "rsrq", "rssinr", "dl_throughput", "ul_throughput_mb", "total_traffic_mb")
+
+
+def _compact_frames(frames: dict[str, pd.DataFrame], project) -> dict[str, pd.DataFrame]:
+    """
+    all_data → categorical cell ids, float64 KPIs, x / y (EPSG:3857, float64)
+    projected once for every stage; grid → categorical cell ids / kpi names.
+    KPIs stay float64: the distribution tables bin them against the same
+    edges as the kpi_hist cube, and float32 moves values across an edge.
+    Idempotent, so frames coming back from the cache can go through it again.
+    """
+    frames = dict(frames)
+    samples = frames.get("all_data")
+    if samples is not None:
+        dtypes = {c: "float64" for c in _SAMPLE_KPIS if c in samples.columns}
+        samples = samples.astype({**dtypes, "siteid_cellid": "category"}, copy=False)
+        if "x" not in samples.columns:
+            xs, ys = project(samples["longitude"].to_numpy(np.float64),
+                             samples["latitude"].to_numpy(np.float64))
+            samples = samples.assign(x=xs, y=ys)
+        frames["all_data"] = samples
+    grid = frames.get("grid")
+    if grid is not None:
+        frames["grid"] = grid.astype({"siteid_cellid": "category", "kpi": "category"}, copy=False)
+    return frames
+
+
+def _partition(df: pd.DataFrame | None, key: str = "siteid_cellid") -> dict[str, pd.DataFrame]:
+    """
+    Sort once by the categorical *key*, then hand out one contiguous slice
+    per value – row slices share the sorted frame's buffers, no per-cell copy.
+    """
+    if df is None or df.empty:
+        return {}
+    df = df.sort_values(key, kind="stable", ignore_index=True)
+    codes = df[key].cat.codes.to_numpy()
+    cuts = np.flatnonzero(np.diff(codes)) + 1
+    starts, stops = np.r_[0, cuts], np.r_[cuts, len(df)]
+    names = df[key].cat.categories
+    return {str(names[codes[a]]): df.iloc[a:b] for a, b in zip(starts, stops) if codes[a] >= 0}
+
+
 # # ── ensure each LTE_Ranges[...] is a RangeDict ─────────────────────────
 # LTE_Ranges = {k: (v if isinstance(v, RangeDict) else RangeDict(v))
 #               for k, v in LTE_Ranges.items()}
@@ -44,7 +93,17 @@ class SSV4G:
         mutex_lock: Lock, 
         *,
         BASE_URL = "http://127.0.0.1:8000",          # <-- change for Docker / prod
-        task_id: int
+        task_id: int,
+        data_source: SSVDataSource | None = None,    # None → HTTP loopback
+        sql_grid: bool = False,                      # plot from SQL 50 m aggregates
+        tech: str = "LTE",
+        cache: SiteDataCache | None = None,          # worker-side (siteid, date, tech) cache
+        render_profile: str = "excel",               # SpatialKPIDensity.RENDER_PROFILES
+        grid_mode: str = "samples",                  # "samples" | GRID_AGGREGATES
+        vector_grid: bool = False,                   # also write the grid as GeoJSON
+        render_cache: bool = False,                  # reuse maps with identical inputs
+        report_engine: str = "openpyxl",             # report_writer.make_report_writer
+        group_workbook: bool = False,                # leave a sheet for the group workbook
 
     ):  
         self.siteid = siteid
@@ -53,39 +112,55 @@ class SSV4G:
         self.BASE_URL = BASE_URL
         self.SSV_URL = f"{self.BASE_URL}/ssv"                     # convenience prefix
         self.task_id = task_id
+        self.http = HTTPSource(self.BASE_URL)
+        self.source = data_source or self.http
+        self.sql_grid = sql_grid
+        self.tech = tech
+        self.cache = cache
+        if RENDER_PROFILES[render_profile].format not in ("png", "jpeg"):
+            raise ValueError(f"render profile {render_profile!r} cannot go into a workbook")
+        self.render_profile = render_profile
+        if grid_mode != "samples" and grid_mode not in GRID_AGGREGATES:
+            raise ValueError(f"unknown grid mode: {grid_mode}")
+        self.grid_mode = grid_mode
+        self.vector_grid = vector_grid
+        self.render_cache = render_cache
+        self.report_engine = report_engine
+        self.group_workbook = group_workbook
+        self.grid: pd.DataFrame | None = None
+        self.hist: pd.DataFrame | None = None
+        self.all_data: pd.DataFrame | None = None
+        self.samples_by_cell: dict[str, pd.DataFrame] | None = None   # views into all_data
+        self.grid_by_cell: dict[str, pd.DataFrame] = {}
+        self._project = to_web_mercator
 
     def query_api(self, path: str, *, params: dict | None = None,
-                  as_df: bool = False, timeout: int = 10):
-        url = f"{self.SSV_URL}/{path}"
-        r   = requests.get(url, params=params, timeout=timeout)
-
-        if r.status_code != 200:
-            raise RuntimeError(f"GET {url} -> {r.status_code}: {r.text}")
-
-        payload = r.json()
-        return pd.DataFrame(payload) if as_df else payload
+                  as_df: bool = False, arrow: bool = False, timeout: int = 10):
+        return self.http.query_api(path, params=params, as_df=as_df,
+                                   arrow=arrow, timeout=timeout)
 
     # ----------------------------------------------------------
     def query_data(self):
-        # 1) site info  – path parameter, no query params
-        self.overall_data = self.query_api(
-            f"get_site_info/{self.siteid}", as_df=True
-        )
-
-        # 2) KPI rows   – query params
-        self.kpi = self.query_api(
-            "get_site_kpi",
-            params={"siteid": self.siteid, "date": self.task_date},
-            as_df=True,
-        )
-        
+        key = (self.siteid, self.task_date, self.tech)
+        frames = self.cache.get(*key) if self.cache is not None else None
+        if frames is None:
+            frames = _compact_frames(self._fetch_frames(), self._project)
+            if self.cache is not None:
+                self.cache.put(*key, frames)
+        else:
+            frames = _compact_frames(frames, self._project)
+
+        self.overall_data = frames["site_info"]
+        self.kpi          = frames["kpi"]
+        self.hist         = frames.get("kpi_hist")
+        self.grid         = frames.get("grid")
+        self.all_data     = frames.get("all_data")
         self.cells: list[str] = self.overall_data["siteid_cellid"].unique().tolist()
 
-        self.all_data = self.query_api(
-            "get_all_data_by_list",
-            params = {"siteid_cellids": json.dumps(self.cells), "date": "2025-01-01"},
-            as_df=True,
-        )
+        # partition once – make_tables / make_plots only look up their cell
+        self.grid_by_cell = _partition(self.grid)
+        if self.all_data is not None:
+            self.samples_by_cell = _partition(self.all_data)
         # ───────── DEBUG: palette / value sanity check (remove later) ─────────
         # test_kpi = "rsrp"            # pick any KPI column you care about
         # if test_kpi in self.all_data.columns:
@@ -96,102 +171,140 @@ class SSV4G:
         #               f"outside colour map → e.g. {sorted(set(bad_vals))[:6]}")
         # ───────────────────────────────────────────────────────────────────────
 
+    def _fetch_frames(self) -> dict[str, pd.DataFrame]:
+        """Pull every input frame from the data source (cache miss)."""
+        # 1) site info + 2) KPI rows – independent, run side by side
+        info_f = _fetch_pool.submit(self.source.site_info, self.siteid)
+        kpi_f  = _fetch_pool.submit(self.source.site_kpi, self.siteid, self.task_date)
+
+        overall_data = info_f.result()
+        cells = overall_data["siteid_cellid"].unique().tolist()
+        hist_f = _fetch_pool.submit(self.source.kpi_hist, cells, self.task_date)
+
+        # 3) raw drive-test samples – as soon as the cell list is known
+        #    (sql_grid: 50 m aggregates instead, samples only if the source has none)
+        grid = self.source.grid_cells(cells, self.task_date) if self.sql_grid else None
+        all_data = self.source.all_data(cells, self.task_date) if grid is None else None
+
+        frames = {"site_info": overall_data, "kpi": kpi_f.result(),
+                  "kpi_hist": hist_f.result(), "grid": grid, "all_data": all_data}
+        return {name: df for name, df in frames.items() if df is not None}
+
+    def _cell_samples(self) -> dict[str, pd.DataFrame]:
+        """Raw samples by cell, fetched on demand when query_data only pulled the grid."""
+        if self.samples_by_cell is None:
+            frames = {"all_data": self.source.all_data(self.cells, self.task_date)}
+            self.all_data = _compact_frames(frames, self._project)["all_data"]
+            self.samples_by_cell = _partition(self.all_data)
+        return self.samples_by_cell
+
 
     def make_tables(self):
         """
         Generates percentage distribution tables for each KPI per cell.
+        Uses the pre-binned kpi_hist cube when the data source has it,
+        otherwise bins the raw samples with np.histogram.
         Returns: dict[cell][kpi] = 2D list (header + rows)
         """
-        import numpy as np
-
-        # Define all bins and labels for KPIs
-        kpi_bins_labels = {
-            "rsrp": (
-                [-np.inf, -141, -120, -110, -100, -95, -90, -80, -70, -44, np.inf],
-                [
-                    "X < -141", "[-141, -120)", "[-120, -110)", "[-110, -100)",
-                    "[-100, -95)", "[-95, -90)", "[-90, -80)", "[-80, -70)",
-                    "[-70, -44)", "X ≥ -44"
-                ],
-            ),
-            "rsrq": (
-                [-np.inf, -20, -18, -12, -10, -6, -3, np.inf],
-                [
-                    "X < -20", "[-20, -18)", "[-18, -12)", "[-12, -10)",
-                    "[-10, -6)", "[-6, -3)", "X ≥ -3"
-                ],
-            ),
-            "rssinr": (
-                [-np.inf, -20, -10, 0, 15, 25, 35, 50, np.inf],
-                [
-                    "X < -20", "[-20, -10)", "[-10, 0)", "[0, 15)",
-                    "[15, 25)", "[25, 35)", "[35, 50)", "X ≥ 50"
-                ]
-            ),
-            "dl_throughput": (
-                [-np.inf, 0, 1000, 3000, 5000, 10000, np.inf],
-                [
-                    "X < 0", "[0, 1000)", "[1000, 3000)", "[3000, 5000)",
-                    "[5000, 10000)", "X ≥ 10000"
-                ],
-            ),
-            "ul_throughput_mb": (
-                [-np.inf, 0, 1000, 3000, 5000, 10000, np.inf],
-                [
-                    "X < 0", "[0, 1000)", "[1000, 3000)", "[3000, 5000)",
-                    "[5000, 10000)", "X ≥ 10000"
-                ],
-            ),
-        }
+        if self.hist is not None and not self.hist.empty:
+            counts_of = self._cube_counts(self.hist)
+        else:
+            counts_of = self._sample_counts
 
         self.tables = {}
 
         for cell in self.cells:
-            cell_data = self.all_data[self.all_data["siteid_cellid"] == cell]
             self.tables[cell] = {}
 
-            for kpi, (bins, labels) in kpi_bins_labels.items():
+            for kpi, (bins, labels) in KPI_BINS.items():
+                counts = counts_of(cell, kpi, bins)
                 # If KPI not in data, skip
-                if kpi not in cell_data.columns:
+                if counts is None:
                     continue
+                self.tables[cell][kpi] = self._distribution_table(kpi, counts, labels)
+
+    def _sample_counts(self, cell, kpi, bins):
+        by_cell = self._cell_samples()
+        if kpi not in self.all_data.columns:
+            return None
+        part = by_cell.get(cell)
+        col = part[kpi].to_numpy(np.float64) if part is not None else np.empty(0)
+        counts, _ = np.histogram(col[~np.isnan(col)], bins=bins)
+        return counts
+
+    @staticmethod
+    def _cube_counts(hist: pd.DataFrame):
+        """(cell, kpi, bins) → counts, read from the kpi_hist rows."""
+        per_key = {
+            key: grp for key, grp in hist.groupby(["siteid_cellid", "kpi"], sort=False)
+        }
+        kpis = {kpi for _, kpi in per_key}
+
+        def counts_of(cell, kpi, bins):
+            if kpi not in kpis:                  # KPI not in data – skipped, as for samples
+                return None
+            grp = per_key.get((cell, kpi))
+            if grp is None:
+                return np.zeros(len(bins) - 1, dtype=np.int64)
+            return np.bincount(grp["bin"].to_numpy(), weights=grp["count"].to_numpy(),
+                               minlength=len(bins) - 1).astype(np.int64)
+
+        return counts_of
+
+    @staticmethod
+    def _distribution_table(kpi, counts, labels):
+        total = int(counts.sum())
+        header = [f"{kpi.upper()} (% Sample)", "Range %"]
+        rows = []
+
+        if total == 0:
+            # No data for this KPI, just zero rows
+            for label in labels:
+                rows.append([label, 0])
+        else:
+            percentages = [round(100 * c / total, 2) for c in counts]
+            for label, percent in zip(labels, percentages):
+                rows.append([label, f"{percent:.2f}", percent])  # 3rd column is raw float
+
+        return [header] + rows
 
-                col = cell_data[kpi].dropna()
-                total = len(col)
-                header = [f"{kpi.upper()} (% Sample)", "Range %"]
-                rows = []
-
-                if total == 0:
-                    # No data for this KPI, just zero rows
-                    for label in labels:
-                        rows.append([label, 0])
-                else:
-                    counts, _ = np.histogram(col, bins=bins)
-                    percentages = [round(100 * c / total, 2) for c in counts]
-                    for label, percent in zip(labels, percentages):
-                        rows.append([label, f"{percent:.2f}", percent])  # 3rd column is raw float
+    def make_plots(self, kpi_list=None, *, pad=1.1, min_km=2.0, max_km=8.0):
+        """
+        Build one SpatialKPIDensity image for every <cell, KPI> pair
+        → self.plots = {cell: {kpi: encoded image bytes}}.
+        """
+        jobs = self.plot_jobs(kpi_list, pad=pad, min_km=min_km, max_km=max_km)
 
+        # basemap + wedge drawn once per cell, KPIs composited on top
+        for cell, images in self._render(jobs).items():
+            self.plots[cell].update(images)
 
-                self.tables[cell][kpi] = [header] + rows
+        return self.plots
 
-    def make_plots(self, kpi_list=None, *, pad=1.1, min_km=2.0, max_km=8.0):
+    def plot_jobs(self, kpi_list=None, *, pad=1.1, min_km=2.0, max_km=8.0) -> list[dict]:
         """
-        Build one SpatialKPIDensity PNG for every <cell, KPI> pair.
+        One render_pool.py job per cell with data (self.plots reset to empty cells).
 
         * window radius = farthest GPS distance × pad (10 % default)
         * clamped between min_km and max_km
         * grid_size fixed at 50 m
         """
-        import numpy as np
         kpi_list = kpi_list or list(LTE_Ranges.keys())
         self.plots = {}
 
+        site_meta = self.overall_data.drop_duplicates("siteid_cellid").set_index("siteid_cellid")
+        jobs = []
+
         for cell in self.cells:
-            df = self.all_data[self.all_data["siteid_cellid"] == cell]
+            if self.grid is not None:                   # 50 m aggregates from SQL
+                df = self.grid_by_cell.get(cell)
+            else:
+                df = self.samples_by_cell.get(cell)
             self.plots[cell] = {}
-            if df.empty:
+            if df is None or df.empty:
                 continue
 
-            meta   = self.overall_data[self.overall_data["siteid_cellid"] == cell].iloc[0]
+            meta   = site_meta.loc[cell]
             bs_lat = float(meta["latitude"])
             bs_lon = float(meta["longitude"])           # ← base-station coords are FIXED
 
@@ -200,15 +313,13 @@ class SSV4G:
             # dx = (df["longitude"] - bs_lon).abs().max() *  85_000
             # win_km = np.clip(np.hypot(dx, dy) * pad / 1_000, min_km, max_km)
             
-            # one-time initialisation -----------------------------------
-            project = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True).transform
-
             # ----------------------------------------------------------
-            # df already has longitude / latitude columns
-            xs, ys = project(df["longitude"].values, df["latitude"].values)
+            # x / y in 3857 – projected once in query_data (grid: from SQL)
+            xs, ys = df["x"].to_numpy(), df["y"].to_numpy()
 
             # base-station projected coords
-            bs_x, bs_y = project(bs_lon, bs_lat)
+            bs_x, bs_y = self._project(bs_lon, bs_lat)
+            layers = _partition(df, "kpi") if self.grid is not None else None
 
             dx = np.abs(xs - bs_x).max()          # max east-west offset  (m)
             dy = np.abs(ys - bs_y).max()          # max north-south offset (m)
@@ -216,78 +327,92 @@ class SSV4G:
             pad_factor = 1.20                     # 20 % breathing room
             win_km = np.clip(np.hypot(dx, dy) * pad_factor / 1_000, min_km, max_km)
 
+            # compact per-(cell, KPI) arrays – rendered in render_pool.py
+            job_layers = []
             for kpi in kpi_list:
-                if kpi not in df.columns:
+                if layers is not None:
+                    layer = layers.get(kpi)
+                    if layer is None:
+                        continue
+                    # SQL grid: the aggregate this report colours by
+                    points = layer["median" if self.grid_mode == "samples" else self.grid_mode]
+                elif kpi not in df.columns:
                     continue
+                else:
+                    layer, points = df, df[kpi]
+                job_layers.append((kpi, {"x": layer["x"].to_numpy(np.float64),
+                                         "y": layer["y"].to_numpy(np.float64),
+                                         "value": points.to_numpy(np.float32)}))
+            if not job_layers:
+                continue
 
-                plotter = SpatialKPIDensityPlot(
+            jobs.append({
+                "cell": cell,
+                "profile": self.render_profile,
+                "plot": dict(
                     bs_lat=bs_lat, bs_lon=bs_lon,
                     azimuth=float(meta.get("azimuth", 0)),
                     beamwidth=float(meta.get("beamwidth", 60)),
-                    # lock= self.lock,
                     radius=100,
                     grid_size=50,
-                    data_points=df,
-                    lon_col="longitude", lat_col="latitude",
-                    kpi_col=kpi, kpi_name=kpi.upper(),
-                    kpi_range_dict=LTE_Ranges[kpi],
                     extent_km=round(float(win_km), 1),
-                )
-                self.plots[cell][kpi] = plotter.plot(out=None)
-
-        return self.plots
+                    aggregate=None if self.grid_mode == "samples" else self.grid_mode,
+                    aggregated=self.grid is not None,   # raw samples: aggregate_squares first
+                ),
+                "layers": job_layers,
+            })
+        return jobs
 
 
 
 
 
-    def section_header(self, ws, title, row, col=2, span=18):
-        ws.merge_cells(start_row=row, start_column=col,
-                       end_row=row, end_column=col+span-1)
-        cell = ws.cell(row=row, column=col)
-        cell.value = title
-        cell.font = Font(bold=True, color="FFFFFF", size=16)
-        cell.alignment = Alignment(horizontal="center")
-        cell.fill = PatternFill("solid", fgColor="3E82FC")
-        return row + 2
-
-    def _add_image_block(self, ws, img: XLImage, row, col, n_cols, n_rows):
-        img.anchor = f"{get_column_letter(col)}{row}"
-        ws.add_image(img)
-
-
-    def _add_table_block(self, ws, table, row, col, fit_columns=False):
-        border = Border(left=Side(style='thin', color='BBBBBB'),
-                        right=Side(style='thin', color='BBBBBB'),
-                        top=Side(style='thin', color='BBBBBB'),
-                        bottom=Side(style='thin', color='BBBBBB'))
-        header_fill = PatternFill("solid", fgColor="D1E6FA")
-        band1 = PatternFill("solid", fgColor="F4F8FB")
-        band2 = PatternFill("solid", fgColor="E9F1F7")
-        center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-        for i, row_data in enumerate(table):
-            for j, val in enumerate(row_data):
-                c = ws.cell(row=row + i, column=col + j, value=val)
-                c.border = border
-                c.alignment = center
-                if i == 0:
-                    c.fill = header_fill
-                    c.font = Font(bold=True, name="Calibri", size=11)
-                elif i % 2 == 0:
-                    c.fill = band1
-                else:
-                    c.fill = band2
+    def _render(self, jobs) -> dict[str, dict[str, bytes]]:
+        return render_cached(jobs) if self.render_cache else render_cells(jobs)
 
-        if fit_columns:
-            self.fit_table_columns(ws, col, table)
-        return row + len(table) - 1
+    def grid_frame(self, kpi_list=None, grid_size=50) -> pd.DataFrame:
+        """
+        50 m grid rows (siteid_cellid, kpi, x, y, count, mean, median, p10)
+        of every cell – the SQL grid when query_data pulled it, otherwise
+        aggregated from the raw samples with the same BS-anchored snapping.
+        """
+        kpi_list = kpi_list or list(LTE_Ranges.keys())
+        if self.grid is not None:
+            return self.grid[self.grid["kpi"].isin(kpi_list)]
 
-    def fit_table_columns(self, ws, start_col, table):
-        max_lens = [max(len(str(row[i])) for row in table) for i in range(len(table[0]))]
-        for i, l in enumerate(max_lens):
-            col_letter = get_column_letter(start_col + i)
-            ws.column_dimensions[col_letter].width = max(10, min(30, l + 4))
+        site_meta = self.overall_data.drop_duplicates("siteid_cellid").set_index("siteid_cellid")
+        parts = []
+        for cell, df in self._cell_samples().items():
+            if df.empty or cell not in site_meta.index:
+                continue
+            meta = site_meta.loc[cell]
+            bs_x, bs_y = self._project(float(meta["longitude"]), float(meta["latitude"]))
+            parts.append(grid_from_samples(df, bs_x, bs_y, kpi_list,
+                                           cell=cell, grid_size=grid_size))
+        if not parts:
+            return pd.DataFrame(columns=list(GRID_COLUMNS))
+        return pd.concat(parts, ignore_index=True)
+
+    def write_grid_geojson(self, out_path: str | None = None) -> str:
+        """Coverage grid as one GeoJSON FeatureCollection (grid_vector.py) → path."""
+        text = geojson_dumps(grid_geojson(self.grid_frame()))
+        out_path = out_path or self._output_path("grid.geojson")
+        with open(out_path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        return out_path
+
+    def _date_str(self) -> str:
+        # make sure self.task_date is a date-like object or ISO string
+        return (self.task_date.strftime("%Y-%m-%d")          # datetime/date
+                if hasattr(self.task_date, "strftime")
+                else str(self.task_date))                    # already a str
+
+    def _output_path(self, suffix: str) -> str:
+        """outputs\\<task_id>\\<siteid>_<date>_4G.<suffix>, directory created."""
+        with self.lock:
+            if not os.path.exists("outputs\\" + str(self.task_id) ):
+                os.makedirs("outputs\\" + str(self.task_id))
+        return "outputs\\" + str(self.task_id) + "\\" + f"{self.siteid}_{self._date_str()}_4G.{suffix}"
 
     # ===============================
     # 1) write_report_onepage
@@ -298,167 +423,44 @@ class SSV4G:
         * Overview tables at the top
         * For every **cell / KPI** block:
               map  →  2‑column table  →  single‑series bar chart
+        Laid out up front (report_layout.py), then streamed (report_writer.py).
         """
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "SSV 4G Report"
-        ws.sheet_view.showGridLines = False
-
-        # --- base column / row sizing –––
-        for c in range(2, 30):
-            ws.column_dimensions[get_column_letter(c)].width = 24
-        for r in range(1, 400):
-            ws.row_dimensions[r].height = 18
-
-        cur = 2
-        cur = self.section_header(ws, f"4G Site Report: {site_name or self.siteid}", cur) + 2
-
-        # ── 1.  OVERVIEW ─────────────────────────────────────────────
-        cur = self.section_header(ws, "Overview - Site Info", cur)
-        overview_tbl = [list(self.overall_data.columns)] + self.overall_data.values.tolist()
-        cur = self._add_table_block(ws, overview_tbl, cur, 2, fit_columns=True) + 3
-
-        cur = self.section_header(ws, "Overview - KPI Summary", cur)
-        kpi_tbl = [list(self.kpi.columns)] + self.kpi.values.tolist()
-        cur = self._add_table_block(ws, kpi_tbl, cur, 2, fit_columns=True) + 3
-
-        # ── 2.  COVERAGE & PERFORMANCE (loop every cell / KPI) ───────
-        cur = self.section_header(ws, "Coverage and Performances", cur) + 1
-
-        for cell, kpi_dict in self.tables.items():
-            ws.merge_cells(start_row=cur, start_column=2, end_row=cur, end_column=8)
-            ws.cell(row=cur, column=2, value=f"Cell: {cell}").font = Font(bold=True, color="3E82FC")
-            cur += 1
-
-            for kpi, source_tbl in kpi_dict.items():
-                ws.merge_cells(start_row=cur, start_column=2, end_row=cur, end_column=8)
-                ws.cell(row=cur, column=2, value=kpi.upper()).font = Font(bold=True)
-                cur += 1
-
-                                # (a)  map — only if make_plots() actually produced one
-                if kpi in self.plots.get(cell, {}):
-                    self._add_image_block(ws, self.plots[cell][kpi], cur, 2, n_cols=6, n_rows=15)
-                else:
-                    # no plot → push table/chart leftwards by 6 cols
-                    tbl_col_offset = -6   # shrink layout
-                    ws.row_dimensions[cur].height = 12
-                
-                # (b)  build trimmed 2‑col table  [Range | %] build trimmed 2‑col table  [Range | %]
-                tbl_col = 2 + 6 + 1
-                trimmed = [["Range", "%"]]
-                for row in source_tbl[1:]:               # skip header
-                    if len(row) < 3:
-                        continue
-                    try:
-                        pct = float(row[2])
-                    except (TypeError, ValueError):
-                        continue
-                    trimmed.append([str(row[0]).strip(), pct])
-
-                tbl_end = self._add_table_block(ws, trimmed, cur, tbl_col, fit_columns=True)
-
-                # (c)  bar chart – only if we have at least 1 data row > 0
-                if len(trimmed) > 1 and any(r[1] > 0 for r in trimmed[1:]):
-                    chart_col = tbl_col + 3
-                    self._add_chart_block(
-                        ws, cur, chart_col,
-                        cur, tbl_col, len(trimmed),
-                        title=f"{kpi.upper()} Distribution"
-                    )
-
-                # move cursor below image/table/chart cluster
-                block_bottom = max(cur + 15, tbl_end)   # 15 rows for the image area
-                cur = block_bottom + 12                  # breathing-room (tweak to taste)
-                ws.row_dimensions[cur].height = 12
-                ws.sheet_view.zoomScale = 70
-
-        with self.lock:
-            if not out_xlsx_path:                               # None, "" or False
-                # make sure self.task_date is a date-like object or ISO string
-                date_str = (self.task_date.strftime("%Y-%m-%d")      # datetime/date
-                            if hasattr(self.task_date, "strftime")
-                            else str(self.task_date))                # already a str
-                out_xlsx_path = f"{self.siteid}_{date_str}_4G.xlsx"
-                if not os.path.exists("outputs\\" + str(self.task_id) ):
-                    os.makedirs("outputs\\" + str(self.task_id))
-                wb.save("outputs\\" + str(self.task_id)+"\\"+out_xlsx_path)
-            else:
-                wb.save(out_xlsx_path or "SSV_4G_Report.xlsx")
-
-    # ------------------------------------------------------------------
-    def _add_chart_block(
-        self,
-        ws,
-        row: int,
-        col: int,
-        table_row: int,
-        table_col: int,
-        table_len: int,
-        title: str,
-    ):
-        """Insert a *single‑series* vertical bar chart that uses the 2‑column
-        table starting at *(table_row, table_col)* as its data source."""
-        first = table_row + 1  # first data row
-        last = table_row + table_len - 1
-        if last < first:
-            return  # nothing to plot
-
-        # Build chart references
-        cats = Reference(ws, min_col=table_col, min_row=first, max_row=last)
-        vals = Reference(ws, min_col=table_col + 1, min_row=first, max_row=last)
-
-        chart = BarChart()
-        chart.type = "col"
-        chart.shape = 4
-        chart.height = 11
-        chart.width = 20
-        chart.add_data(vals, titles_from_data=False, from_rows=False)  # single series
-        chart.set_categories(cats)
-
-        # ── axes ────────────────────────────────────────────────
-        chart.x_axis.title = None
-        chart.x_axis.tickLblPos = "low"
-        chart.x_axis.textRotation = 45
-        chart.x_axis.majorTickMark = "out"
-        chart.x_axis.majorGridlines = None
-        chart.x_axis.delete = False  # make sure axis is visible
-
-        chart.y_axis.title = None
-        chart.y_axis.majorGridlines = None
-        chart.y_axis.delete = False
-
-        # Add ≈20 % head‑room so the tallest bar doesn’t hit the title
-        val_col = table_col + 1
-        max_val = 0
-        for r in ws.iter_rows(min_col=val_col, max_col=val_col, min_row=first, max_row=last):
-            try:
-                v = float(r[0].value)
-            except (TypeError, ValueError):
-                v = 0
-            max_val = max(max_val, v)
-        if max_val > 0:
-            chart.y_axis.scaling.max = max_val * 1.2
-
-        # ── labels & legend ─────────────────────────────────────
-        chart.dataLabels = DataLabelList()
-        chart.dataLabels.showVal = True      # numeric value on bars
-        chart.dataLabels.showSerName = False # hide “Series1” etc.
-        chart.dataLabels.showCatName = False # keep cat names only on x‑axis
-        chart.legend = None                  # hide redundant legend
-
-        # ── title ───────────────────────────────────────────────
-        chart.title = title
-        chart.title_overlay = False
-
-        # finally add chart at top‑left of the chart region
-        ws.add_chart(chart, f"{get_column_letter(col)}{row}")
-
+        out_xlsx_path = out_xlsx_path or self._output_path("xlsx")   # makedirs under the lock
+        layout = self.report_layout(site_name)
+        with make_report_writer(self.report_engine, out_xlsx_path) as writer:
+            writer.add_sheet("SSV 4G Report", layout)
+
+    def write_sheet_artifact(self, site_name: str | None = None) -> str:
+        """This site's sheet for the group workbook (group_workbook.py) → its directory."""
+        path = self._output_path(SHEET_SUFFIX)
+        save_sheet(path, f"{site_name or self.siteid} {self._date_str()}",
+                   self.report_layout(site_name))
+        return path
+
+    def write_report(self) -> None:
+        """The one-pager, or this site's group-workbook sheet."""
+        if self.group_workbook:
+            self.write_sheet_artifact()
+        else:
+            self.write_report_onepage()
+
+    def report_layout(self, site_name: str | None = None) -> SheetLayout:
+        """The one-pager's SheetLayout – needs make_tables() and make_plots()."""
+        return onepage_layout(
+            f"4G Site Report: {site_name or self.siteid}",
+            [list(self.overall_data.columns)] + self.overall_data.values.tolist(),
+            [list(self.kpi.columns)] + self.kpi.values.tolist(),
+            self.tables,
+            self.plots,
+        )
 
     def build(self):
         self.query_data()
         self.make_tables()
         self.make_plots()
-        self.write_report_onepage()
+        self.write_report()
+        if self.vector_grid:
+            self.write_grid_geojson()
 
     def __str__(self):
         return ", \n".join(f"{k}=\n{v}\n" for k, v in vars(self).items())
@@ -1,7 +1,3 @@
-import os, pyproj.datadir
-os.environ["PROJ_LIB"] = pyproj.datadir.get_data_dir()
-os.environ["PROJ_NETWORK"] = "ON"
-
 #!/usr/bin/env python
 # ── SpatialKPIDensity.py ──────────────────────────────────────────────
 """50 m-grid KPI heat-map over an OpenStreetMap basemap."""
@@ -9,14 +5,19 @@ os.environ["PROJ_NETWORK"] = "ON"
 import os, numpy as np, pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle, Wedge, Patch
+from matplotlib.colors import to_rgba_array
 
 from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.figure import Figure
 
-import contextily as ctx
-from pyproj import Transformer, datadir as _pd
 from io import BytesIO
+from typing import NamedTuple
+from PIL import Image as PILImage
 from openpyxl.drawing.image import Image as XLImage
+
+from .RangeDict import COUNT_Ranges, RangeDict
+from .tile_cache import get_tile_fetcher
+from .projection import to_web_mercator
 # from threading import Lock
 
 os.environ["MPLBACKEND"] = "Agg"   # <- 100 % non-GUI backend
@@ -24,12 +25,85 @@ os.environ["MPLBACKEND"] = "Agg"   # <- 100 % non-GUI backend
 import matplotlib                  # happens AFTER the env var
 matplotlib.use("Agg", force=True)  # belt-and-suspenders
 plt.ioff()                         # disable interactive state
-# -- enable online tiles for PROJ 6+
-os.environ["PROJ_LIB"]     = _pd.get_data_dir()
-os.environ["PROJ_NETWORK"] = "ON"
 
 
 
+SQUARE_ALPHA = 0.7                 # one 50 m square over the basemap
+FIG_INCHES   = 8                   # square figure, 8 × 8 in
+
+
+class RenderProfile(NamedTuple):
+    dpi: int                        # FIG_INCHES × dpi ≈ output pixels (before the tight crop)
+    format: str                     # "png" | "webp" | "jpeg"
+    palette: int = 0                # >0 → quantise to that many colours (png only)
+    quality: int = 85               # webp / jpeg
+
+
+# the excel profile targets 2× the 500 px the workbook shows (sharp when zoomed);
+# the heat-map is ~10 flat colours over a basemap → 256-colour palette PNG
+RENDER_PROFILES: dict[str, RenderProfile] = {
+    "excel": RenderProfile(dpi=125, format="png", palette=256),
+    "print": RenderProfile(dpi=300, format="png"),
+    "web":   RenderProfile(dpi=75,  format="webp", quality=80),
+}
+
+
+def encode_image(rgba: np.ndarray, profile: RenderProfile) -> bytes:
+    """RGBA uint8 array → encoded bytes in the profile's format."""
+    img = PILImage.fromarray(rgba)
+    buf = BytesIO()
+    match profile.format:
+        case "png" if profile.palette:
+            img.quantize(colors=profile.palette, method=PILImage.Quantize.FASTOCTREE) \
+               .save(buf, format="PNG", optimize=True)
+        case "png":
+            img.save(buf, format="PNG")
+        case "webp":
+            img.save(buf, format="WEBP", quality=profile.quality, method=4)
+        case "jpeg":
+            img.convert("RGB").save(buf, format="JPEG", quality=profile.quality, optimize=True)
+        case _:
+            raise ValueError(f"unknown image format: {profile.format}")
+    return buf.getvalue()
+
+
+GRID_AGGREGATES = ("median", "mean", "p10", "count")
+
+
+def aggregate_squares(ix: np.ndarray, iy: np.ndarray, vals: np.ndarray, how: str):
+    """
+    One value per occupied square in a single sort-and-reduce pass:
+    lexsort by (square, value), then reduce every run of equal squares.
+    median / p10 interpolate linearly like np.percentile.  NaNs are dropped.
+    Returns (ix, iy, value) of the occupied squares.
+    """
+    if how not in GRID_AGGREGATES:
+        raise ValueError(f"unknown grid aggregate: {how}")
+    vals = np.asarray(vals, np.float64)
+    ok = ~np.isnan(vals)
+    ix, iy, vals = ix[ok], iy[ok], vals[ok]
+    if vals.size == 0:
+        return ix, iy, vals
+
+    order = np.lexsort((vals, iy, ix))
+    ix, iy, vals = ix[order], iy[order], vals[order]
+    starts = np.flatnonzero(np.r_[True, (np.diff(ix) != 0) | (np.diff(iy) != 0)])
+    counts = np.diff(np.r_[starts, vals.size])
+
+    match how:
+        case "count":
+            out = counts.astype(np.float64)
+        case "mean":
+            out = np.add.reduceat(vals, starts) / counts
+        case _:
+            q   = 0.5 if how == "median" else 0.1
+            pos = starts + (counts - 1) * q
+            lo  = np.floor(pos).astype(np.int64)
+            hi  = np.minimum(lo + 1, starts + counts - 1)
+            out = vals[lo] + (pos - lo) * (vals[hi] - vals[lo])
+    return ix[starts], iy[starts], out
+
+
 # ──────────────────────────────────────────────────────────────────────
 class SpatialKPIDensityPlot:
     """Draw a 50 m KPI heat-map around a base-station location."""
@@ -51,76 +125,188 @@ class SpatialKPIDensityPlot:
         kpi_range_dict:    dict = None,
         extent_km: float   = 2.0,
         sector_frac: float = 0.05,
-        
+        grid_points: pd.DataFrame | None = None,   # pre-aggregated squares (x, y in 3857)
+        grid_value: str    = "median",             # which aggregate colours a square
+        x_col: str | None  = None,                 # data_points already projected (3857)
+        y_col: str | None  = None,
+        render: str        = "raster",             # "raster" (one image) | "patches" (legacy)
+        aggregate: str | None = None,              # GRID_AGGREGATES → one value per square
+        aggregated: bool | None = None,            # grid_points already one row per square
     ):
         self.bs_lat, self.bs_lon = bs_lat, bs_lon
         self.azimuth, self.beamwidth = azimuth, beamwidth
         # self.lock = lock
         self.radius, self.grid_size  = sector_frac * extent_km * 1000, grid_size
         self.lon_col, self.lat_col   = lon_col, lat_col
+        self.x_col, self.y_col       = x_col, y_col
         self.kpi_col, self.kpi_name  = kpi_col, kpi_name
-        self.kpi_range_dict          = kpi_range_dict or {}
+        self.kpi_range_dict          = kpi_range_dict if isinstance(kpi_range_dict, RangeDict) \
+                                       else RangeDict(kpi_range_dict or {})
         self.extent_km               = float(extent_km)
+        if render not in ("raster", "patches"):
+            raise ValueError(f"unknown render mode: {render}")
+        self.render                  = render
+        if aggregate is not None and aggregate not in GRID_AGGREGATES:
+            raise ValueError(f"unknown grid aggregate: {aggregate}")
+        self.aggregate               = aggregate
+        # "count" colours sample density, not the KPI
+        self.legend_ranges           = COUNT_Ranges if aggregate == "count" else self.kpi_range_dict
+        self._points_aggregated      = grid_points is not None if aggregated is None \
+                                       else aggregated
 
-        # WGS84 → Web-Mercator
-        self._proj    = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
-        self.bs_x, self.bs_y = self._proj.transform(bs_lon, bs_lat)
+        # WGS84 → Web-Mercator (per-thread cached transformer, projection.py)
+        self.bs_x, self.bs_y = to_web_mercator(bs_lon, bs_lat)
 
         self.data_points = data_points if data_points is not None else \
             pd.DataFrame(columns=[lon_col, lat_col, kpi_col])
-        self.points_proj = self._project_points()
+        if grid_points is not None:
+            # already projected + snapped (database/ssv.py:grid_by_list)
+            # (a DataFrame or a plain dict of arrays – render_pool.py jobs)
+            self.points_proj = (np.asarray(grid_points["x"], np.float64),
+                                np.asarray(grid_points["y"], np.float64),
+                                np.asarray(grid_points[grid_value], np.float64))
+        else:
+            self.points_proj = self._project_points()
         # print(self.data_points)
         # print(self.points_proj)
 
     # ------------------------------------------------------------------
     def _project_points(self):
-        lon = self.data_points[self.lon_col].values
-        lat = self.data_points[self.lat_col].values
-        kpi = self.data_points[self.kpi_col].values
-        xs, ys = self._proj.transform(lon, lat)
+        """(xs, ys, values) as float64 arrays in EPSG:3857."""
+        kpi = self.data_points[self.kpi_col].to_numpy(np.float64, na_value=np.nan)
+        if self.x_col and self.y_col:
+            xs = self.data_points[self.x_col].to_numpy(np.float64)
+            ys = self.data_points[self.y_col].to_numpy(np.float64)
+        else:
+            lon = self.data_points[self.lon_col].to_numpy(np.float64)
+            lat = self.data_points[self.lat_col].to_numpy(np.float64)
+            xs, ys = to_web_mercator(lon, lat)
 
-        return list(zip(xs, ys, kpi))
+        return np.asarray(xs, np.float64), np.asarray(ys, np.float64), kpi
 
     # ------------------------------------------------------------------
-    def plot(self, out: str | None = None):
-        """Return an openpyxl Image (for Excel) or save PNG if *out* is given."""
+    def _square_indices(self, xs: np.ndarray, ys: np.ndarray):
+        """
+        Grid square of every point on an n × n raster centred on the BS
+        (covers the frame); returns (ix, iy, inside-mask, n).
+        """
+        g    = self.grid_size
+        half = int(np.ceil(500 * self.extent_km / g)) + 1      # squares from BS to frame edge
+        ix = np.round((xs - self.bs_x) / g).astype(np.int64) + half
+        iy = np.round((ys - self.bs_y) / g).astype(np.int64) + half
+        n = 2 * half + 1
+        inside = (ix >= 0) & (ix < n) & (iy >= 0) & (iy < n)
+        return ix, iy, inside, n
 
-        fig = Figure(figsize=(8, 8))
-        FigureCanvasAgg(fig)              # attaches a canvas
-        ax = fig.add_subplot(111)
-        # fig, ax = plt.subplots(figsize=(8, 8))
+    def _square_image(self, ax, rgba: np.ndarray, n: int):
+        lo = -(n / 2) * self.grid_size
+        return ax.imshow(rgba.reshape(n, n, 4), origin="lower", interpolation="nearest",
+                         extent=(self.bs_x + lo, self.bs_x - lo, self.bs_y + lo, self.bs_y - lo),
+                         aspect="auto", zorder=3)
 
-        # -- frame extents
-        km = self.extent_km
-        ax.set_xlim(self.bs_x - 500 * km, self.bs_x + 500 * km)
-        ax.set_ylim(self.bs_y - 500 * km, self.bs_y + 500 * km)
+    def _draw_raster(self, ax):
+        """
+        All 50 m squares as one RGBA image: bin the points onto the grid,
+        colour-index them in one pass and blend each square the way the
+        stacked per-sample patches were alpha-composited.
+        """
+        xs, ys, vals = self.points_proj
+        cidx = self.kpi_range_dict.lookup(vals)
+        keep = cidx >= 0
+        if not keep.any():
+            return []
 
-        # -- basemap (z 0)
-        ctx.add_basemap(ax, crs="EPSG:3857",
-                        source=ctx.providers.OpenStreetMap.Mapnik,
-                        alpha=0.8, attribution=False, zorder=0)
+        ix, iy, inside, n = self._square_indices(xs[keep], ys[keep])
+        ix, iy, cidx = ix[inside], iy[inside], cidx[keep][inside]
+        if ix.size == 0:
+            return []
 
-        # -- 50 m squares (z 3)
-        for px, py, val in self.points_proj:
-            # print(f'{px} {py} {val}')
-            
+        # stacking n patches of alpha a ("over", in draw order) equals one
+        # layer with alpha 1-(1-a)^n whose colour weighs sample k by
+        # a·(1-a)^(samples drawn after k in the same square)
+        flat  = iy * n + ix
+        order = np.argsort(flat, kind="stable")                 # keeps draw order per square
+        sflat = flat[order]
+        count = np.bincount(sflat, minlength=n * n)
+        first = np.cumsum(count) - count
+        after = count[sflat] - 1 - (np.arange(sflat.size) - first[sflat])
+        weight = SQUARE_ALPHA * (1 - SQUARE_ALPHA) ** after
+
+        palette = to_rgba_array(self.kpi_range_dict.colours)[:, :3]
+        rgb = np.stack([np.bincount(sflat, weights=weight * palette[cidx[order], c],
+                                    minlength=n * n) for c in range(3)], axis=1)
+        alpha = 1 - (1 - SQUARE_ALPHA) ** count
+        hit = count > 0
+        rgba = np.zeros((n * n, 4))
+        rgba[hit, :3] = rgb[hit] / alpha[hit, None]
+        rgba[hit, 3]  = alpha[hit]
+        np.clip(rgba, 0.0, 1.0, out=rgba)                       # float rounding of rgb / alpha
+        return [self._square_image(ax, rgba, n)]
+
+    def _draw_aggregated(self, ax):
+        """One value per 50 m square (median / mean / p10 / count), one colour each."""
+        xs, ys, vals = self.points_proj
+        ix, iy, inside, n = self._square_indices(xs, ys)
+        ix, iy, vals = ix[inside], iy[inside], vals[inside]
+        if self._points_aggregated:             # SQL grid – already one row per square
+            values = vals
+        else:
+            ix, iy, values = aggregate_squares(ix, iy, vals, self.aggregate)
+
+        cidx = self.legend_ranges.lookup(values)
+        hit = cidx >= 0
+        if not hit.any():
+            return []
+        rgba = np.zeros((n * n, 4))
+        rgba[iy[hit] * n + ix[hit]] = to_rgba_array(self.legend_ranges.colours)[cidx[hit]]
+        rgba[:, 3] *= SQUARE_ALPHA
+        return [self._square_image(ax, rgba, n)]
+
+    # ------------------------------------------------------------------
+    def _draw_patches(self, ax):
+        """Legacy path – one Rectangle per point."""
+        patches = []
+        for px, py, val in zip(*self.points_proj):
             if pd.isna(val):
-                #print("continued")
                 continue
             # RangeDict.__getitem__ handles the “find-the-bin” logic
             try:
                 colour = self.kpi_range_dict[val]
-                # print(colour)
             except KeyError:
                 continue    # value outside all bins → skip
 
             gx = self.bs_x + self.grid_size * round((px - self.bs_x) / self.grid_size)
             gy = self.bs_y + self.grid_size * round((py - self.bs_y) / self.grid_size)
-            # print(f'gx: {gx} gy: {gy}')
-            ax.add_patch(Rectangle(
+            patches.append(ax.add_patch(Rectangle(
                 (gx - self.grid_size / 2, gy - self.grid_size / 2),
                 self.grid_size, self.grid_size,
-                facecolor=colour, edgecolor="none", alpha=0.7, zorder=3))
+                facecolor=colour, edgecolor="none", alpha=SQUARE_ALPHA, zorder=3)))
+        return patches
+
+    # ------------------------------------------------------------------
+    @property
+    def background_key(self) -> tuple:
+        """Everything draw_background depends on – equal keys, equal pixels."""
+        return (self.bs_x, self.bs_y, self.extent_km, self.radius,
+                self.azimuth, self.beamwidth)
+
+    def draw_background(self, ax) -> bool:
+        """
+        Frame, basemap (z 0) and sector wedge (z 2) – the same for every KPI.
+        Returns False when basemap tiles were missing (transparent holes).
+        """
+        km = self.extent_km
+        ax.set_xlim(self.bs_x - 500 * km, self.bs_x + 500 * km)
+        ax.set_ylim(self.bs_y - 500 * km, self.bs_y + 500 * km)
+
+        # -- basemap (z 0) – OSM tiles from the local store (tile_cache.py)
+        tiles, tiles_extent, complete = get_tile_fetcher().basemap(
+            self.bs_x - 500 * km, self.bs_y - 500 * km,
+            self.bs_x + 500 * km, self.bs_y + 500 * km)
+        ax.imshow(tiles, extent=tiles_extent, interpolation="bilinear",
+                  alpha=0.8, aspect="auto", zorder=0)
+        ax.set_xlim(self.bs_x - 500 * km, self.bs_x + 500 * km)     # imshow autoscales
+        ax.set_ylim(self.bs_y - 500 * km, self.bs_y + 500 * km)
 
         # -- antenna sector (z 2)
         ax.add_patch(Wedge(
@@ -130,30 +316,91 @@ class SpatialKPIDensityPlot:
             facecolor=(1, 0, 0, .15), edgecolor="red", lw=2,
             label="Sector", zorder=2))
 
+        ax.set_xticks([]); ax.set_yticks([]); ax.set_xlabel(""); ax.set_ylabel("")
+        return complete
+
+    def draw_overlay(self, ax) -> list:
+        """50 m squares (z 3) + legend; returns the artists it added."""
+        # -- 50 m squares (z 3)
+        if self.aggregate is not None:
+            artists = self._draw_aggregated(ax)
+        elif self.render == "raster":
+            artists = self._draw_raster(ax)
+        else:
+            artists = self._draw_patches(ax)
+
         # -- legend
         leg_patches = [Patch(color=c, label=l.replace(":", " to "))
-                       for l, c in self.kpi_range_dict.items()]
+                       for l, c in self.legend_ranges.items()]
         leg_patches.append(Patch(facecolor="none", edgecolor="red", lw=2, label="Sector"))
-        ax.legend(handles=leg_patches, title=self.kpi_name, loc="lower left")
+        title = self.kpi_name if self.aggregate is None else f"{self.kpi_name} ({self.aggregate})"
+        artists.append(ax.legend(handles=leg_patches, title=title, loc="lower left"))
+        return artists
 
-        ax.set_xticks([]); ax.set_yticks([]); ax.set_xlabel(""); ax.set_ylabel("")
-        plt.tight_layout()
+    # ------------------------------------------------------------------
+    def plot(self, out: str | None = None, profile: str = "print"):
+        """
+        Return an openpyxl Image (for Excel) or save the image if *out* is
+        given; DPI / encoding from RENDER_PROFILES[profile].
+        """
+        data = CellBackground(self, profile=profile).render_bytes(self)
 
         # -- output
         if out:
-            fig.savefig(out, dpi=300, bbox_inches="tight")
-            fig.clear()
+            with open(out, "wb") as fh:
+                fh.write(data)
             return out
-        else:
-            # show window for manual inspection
-            # plt.show()                       # << interactive window
-            # with self.lock:
-            buf = BytesIO()
-            fig.savefig(buf, format="png", dpi=300, bbox_inches="tight")
-            buf.seek(0)
-            fig.clear()
-            img = XLImage(buf); img.width = 500; img.height = 500
-            return img
+        img = XLImage(BytesIO(data)); img.width = 500; img.height = 500
+        return img
+
+
+# ──────────────────────────────────────────────────────────────────────
+class CellBackground:
+    """
+    Basemap + sector wedge of one cell, rasterised once at the profile's DPI.
+    render(plot) restores that raster and draws only the plot's squares and
+    legend on top (Agg blitting), so the KPIs of a cell share one basemap
+    fetch / decode / resample instead of one each.
+    """
+
+    def __init__(self, first: SpatialKPIDensityPlot, *, profile: str = "print",
+                 pad_inches: float = 0.1):
+        self.key = first.background_key
+        self.profile = RENDER_PROFILES[profile]
+        dpi = self.profile.dpi
+        self.fig = Figure(figsize=(FIG_INCHES, FIG_INCHES), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(111)
+
+        self.complete = first.draw_background(self.ax)   # basemap without holes
+        self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+        # savefig(bbox_inches="tight") crop – the legend sits inside the axes,
+        # so the box is the same for every KPI
+        tight = self.fig.get_tightbbox(self.canvas.get_renderer()).padded(pad_inches)
+        height = self.canvas.get_width_height()[1]
+        x0, y0, x1, y1 = (np.array(tight.extents) * dpi).round().astype(int)
+        self._crop = (slice(max(0, height - y1), height - y0), slice(max(0, x0), x1))
+
+    def render(self, plot: SpatialKPIDensityPlot) -> XLImage:
+        img = XLImage(BytesIO(self.render_bytes(plot))); img.width = 500; img.height = 500
+        return img
+
+    def render_bytes(self, plot: SpatialKPIDensityPlot) -> bytes:
+        """The plot encoded per the profile (PNG / WebP / JPEG)."""
+        if plot.background_key != self.key:
+            raise ValueError("plot does not share this cell background")
+
+        self.canvas.restore_region(self._background)
+        artists = plot.draw_overlay(self.ax)
+        for artist in artists:
+            self.ax.draw_artist(artist)
+        rgba = np.asarray(self.canvas.buffer_rgba())[self._crop]
+        for artist in artists:
+            artist.remove()
+
+        return encode_image(rgba, self.profile)
 
 # ── self-test -- run “python SpatialKPIDensity.py” ───────────────────
 # if __name__ == "__main__":
@@ -0,0 +1,117 @@
+# BACKEND/tasks/SSV/api_client.py
+"""
+Shared HTTP client for the loopback  BASE_URL/ssv/...  calls.
+
+One `requests.Session` per base URL and worker process:
+* keep-alive connection pool sized for the Celery thread pool
+* gzip (the API adds GZipMiddleware)
+* bounded retries with exponential backoff on connect errors / 502-504
+* per-call latency metrics  →  get_api_client(url).metrics.snapshot(),
+  logged at INFO by log_api_metrics() when an SSV task ends
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger("ssv.api_client")
+
+
+class CallMetrics:
+    """Thread-safe latency counters, one bucket per endpoint name."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._stats: dict[str, dict[str, float]] = defaultdict(
+            lambda: {"count": 0, "errors": 0, "total_s": 0.0, "max_s": 0.0}
+        )
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            s = self._stats[name]
+            s["count"] += 1
+            s["errors"] += 0 if ok else 1
+            s["total_s"] += seconds
+            s["max_s"] = max(s["max_s"], seconds)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                name: {**s, "avg_s": s["total_s"] / s["count"] if s["count"] else 0.0}
+                for name, s in self._stats.items()
+            }
+
+
+class SSVApiClient:
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        pool_size: int = 16,
+        retries: int = 3,
+        backoff: float = 0.3,
+        timeout: int = 10,
+    ):
+        self.SSV_URL = f"{base_url}/ssv"
+        self.timeout = timeout
+        self.metrics = CallMetrics()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,                 # 0.3 → 0.6 → 1.2 s
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,                  # hand the last response back
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip"})
+
+    def get(self, path: str, *, params: dict | None = None,
+            headers: dict | None = None, timeout: int | None = None) -> requests.Response:
+        name = path.split("/", 1)[0]                # "get_site_info/69491" → "get_site_info"
+        start = time.perf_counter()
+        ok = False
+        try:
+            r = self.session.get(f"{self.SSV_URL}/{path}", params=params,
+                                 headers=headers, timeout=timeout or self.timeout)
+            ok = r.status_code == 200
+            return r
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.record(name, elapsed, ok)
+            log.debug("GET %s %.3fs ok=%s", name, elapsed, ok)
+
+
+# ──────────────────────────────────────────────────────────
+# one client per base URL and process
+# ──────────────────────────────────────────────────────────
+_clients: dict[str, SSVApiClient] = {}
+_clients_lock = Lock()
+
+
+def get_api_client(base_url: str, **kwargs) -> SSVApiClient:
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = SSVApiClient(base_url, **kwargs)
+        return client
+
+
+def log_api_metrics() -> None:
+    """One INFO line per endpoint of every client in this process (cumulative)."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        for name, s in sorted(client.metrics.snapshot().items()):
+            log.info("%s/%s: %d calls, %d errors, avg %.3fs, max %.3fs", client.SSV_URL, name,
+                     s["count"], s["errors"], s["avg_s"], s["max_s"])
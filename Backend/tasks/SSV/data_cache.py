@@ -0,0 +1,221 @@
+# BACKEND/tasks/SSV/data_cache.py
+"""
+Worker-side cache of the SSV input frames, keyed by (siteid, date, tech).
+
+Two layers:
+* memory – LRU, bounded by the frames' byte size
+* disk   – one Parquet file per frame under
+           <root>/<tech>/<date>/<siteid>/<name>.parquet   (needs pyarrow)
+
+Freshness contract: TTL only.  all_data / kpi_data are loaded outside this
+application, so nothing here knows when a site's rows change – an entry is
+served for at most *ttl_s* (SSV_CACHE_TTL_S) after it was fetched, and that
+is the staleness to expect after a re-ingest.
+
+`invalidate()` (tasks.maintenance.invalidate_ssv_cache) is a manual shortcut
+on top: it drops matching entries from both layers of the process that runs
+it.  Other processes only see it through the disk layer (memory hits are
+checked against the disk entry), i.e. only when pyarrow is installed.
+"""
+from __future__ import annotations
+
+import logging
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from threading import Lock
+
+import pandas as pd
+
+from config import settings
+
+try:
+    import pyarrow  # noqa: F401  – only needed for the Parquet layer
+    _HAS_PARQUET = True
+except ImportError:
+    _HAS_PARQUET = False
+
+log = logging.getLogger("ssv.data_cache")
+
+Key = tuple[str, str, str]                   # (siteid, date ISO, tech)
+
+
+def _key(siteid, site_date, tech) -> Key:
+    day = site_date.isoformat() if isinstance(site_date, date) else str(site_date)
+    return str(siteid), day, str(tech).upper()
+
+
+def _nbytes(frames: dict[str, pd.DataFrame]) -> int:
+    return int(sum(df.memory_usage(deep=True).sum() for df in frames.values()))
+
+
+def _shallow(frames: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+    # callers may add columns, but must not write into the cached buffers
+    return {name: df.copy(deep=False) for name, df in frames.items()}
+
+
+class SiteDataCache:
+    def __init__(
+        self,
+        root: str | Path,
+        *,
+        max_bytes: int = 512 * 1024 ** 2,
+        ttl_s: float = 6 * 3600,
+        use_disk: bool = True,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.use_disk = use_disk and _HAS_PARQUET
+
+        self._lock = Lock()
+        # key → (frames, nbytes, stored_at)
+        self._mem: OrderedDict[Key, tuple[dict[str, pd.DataFrame], int, float]] = OrderedDict()
+        self._mem_bytes = 0
+
+        if self.use_disk:
+            self.root.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+    def get(self, siteid, site_date, tech="LTE") -> dict[str, pd.DataFrame] | None:
+        key = _key(siteid, site_date, tech)
+        now = time.time()
+
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                frames, _, stored_at = hit
+                if now - stored_at <= self.ttl_s and self._disk_agrees(key, stored_at):
+                    self._mem.move_to_end(key)
+                    return _shallow(frames)
+                self._drop_mem(key)
+
+        disk = self._read_disk(key, now)
+        if disk is None:
+            return None
+        frames, stored_at = disk
+        self._store_mem(key, frames, stored_at)
+        return _shallow(frames)
+
+    def put(self, siteid, site_date, tech, frames: dict[str, pd.DataFrame]) -> None:
+        key = _key(siteid, site_date, tech)
+        stored_at = self._write_disk(key, frames) if self.use_disk else time.time()
+        self._store_mem(key, frames, stored_at)
+
+    def invalidate(self, *, siteid=None, site_date=None, tech=None) -> int:
+        """
+        Drop every entry matching the given parts (None = any).
+        Returns the number of entries removed from memory + disk.
+        """
+        want = (
+            None if siteid is None else str(siteid),
+            None if site_date is None else _key("", site_date, "")[1],
+            None if tech is None else str(tech).upper(),
+        )
+
+        def match(key: Key) -> bool:
+            return all(w is None or w == k for w, k in zip(want, key))
+
+        removed = 0
+        with self._lock:
+            for key in [k for k in self._mem if match(k)]:
+                self._drop_mem(key)
+                removed += 1
+
+        if self.use_disk:
+            for entry in self.root.glob("*/*/*"):
+                tech_s, day, site = entry.parts[-3:]
+                if site.startswith("."):               # write in progress
+                    continue
+                if entry.is_dir() and match((site, day, tech_s)):
+                    shutil.rmtree(entry, ignore_errors=True)
+                    removed += 1
+        return removed
+
+    # ------------------------------------------------------------------
+    # memory layer
+    # ------------------------------------------------------------------
+    def _store_mem(self, key: Key, frames: dict[str, pd.DataFrame], stored_at: float) -> None:
+        size = _nbytes(frames)
+        if size > self.max_bytes:                      # would evict everything else
+            return
+        with self._lock:
+            self._drop_mem(key)
+            self._mem[key] = (frames, size, stored_at)
+            self._mem_bytes += size
+            while self._mem_bytes > self.max_bytes:
+                old, (_, old_size, _) = self._mem.popitem(last=False)
+                self._mem_bytes -= old_size
+                log.debug("evicted %s (%d bytes)", old, old_size)
+
+    def _drop_mem(self, key: Key) -> None:
+        entry = self._mem.pop(key, None)
+        if entry is not None:
+            self._mem_bytes -= entry[1]
+
+    # ------------------------------------------------------------------
+    # disk layer
+    # ------------------------------------------------------------------
+    def _disk_dir(self, key: Key) -> Path:
+        siteid, day, tech = key
+        return self.root / tech / day / siteid
+
+    def _disk_agrees(self, key: Key, stored_at: float) -> bool:
+        if not self.use_disk:
+            return True
+        try:
+            return self._disk_dir(key).stat().st_mtime == stored_at
+        except FileNotFoundError:                      # invalidated elsewhere
+            return False
+
+    def _read_disk(self, key: Key, now: float) -> tuple[dict[str, pd.DataFrame], float] | None:
+        """(frames, entry mtime) – the mtime of the stat the read was checked against."""
+        if not self.use_disk:
+            return None
+        entry = self._disk_dir(key)
+        try:
+            mtime = entry.stat().st_mtime
+            if now - mtime > self.ttl_s:
+                shutil.rmtree(entry, ignore_errors=True)
+                return None
+            frames = {f.stem: pd.read_parquet(f) for f in entry.glob("*.parquet")}
+        except OSError as exc:                         # incl. invalidated mid-read
+            log.debug("disk miss %s: %s", key, exc)
+            return None
+        return (frames, mtime) if frames else None
+
+    def _write_disk(self, key: Key, frames: dict[str, pd.DataFrame]) -> float:
+        final = self._disk_dir(key)
+        tmp = final.with_name(f".{final.name}.{uuid.uuid4().hex}.tmp")
+        tmp.mkdir(parents=True)
+        for name, df in frames.items():
+            df.to_parquet(tmp / f"{name}.parquet", index=False)
+
+        shutil.rmtree(final, ignore_errors=True)
+        tmp.replace(final)                             # same filesystem → atomic
+        return final.stat().st_mtime
+
+
+# ──────────────────────────────────────────────────────────
+# one cache per worker process
+# ──────────────────────────────────────────────────────────
+_cache: SiteDataCache | None = None
+_cache_lock = Lock()
+
+
+def get_site_cache() -> SiteDataCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            root = settings.SSV_CACHE_DIR or Path(__file__).resolve().parents[2] / "cache" / "ssv"
+            _cache = SiteDataCache(
+                root,
+                max_bytes=settings.SSV_CACHE_MAX_MB * 1024 ** 2,
+                ttl_s=settings.SSV_CACHE_TTL_S,
+            )
+        return _cache
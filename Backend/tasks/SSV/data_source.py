@@ -0,0 +1,261 @@
+# BACKEND/tasks/SSV/data_source.py
+"""
+Where SSV4G gets its three data sets (celldb / kpi_data / all_data) from.
+
+* DBSource       – reads the tables through the *sync* engine in
+                   database/db.py and builds DataFrames from the cursor
+                   (default for the Celery worker – no HTTP hop)
+* HTTPSource     – the original loopback calls to  BASE_URL/ssv/...
+                   (pooled, retrying client from api_client.py)
+* FallbackSource – try the first source, use the second one when the
+                   first cannot be reached (NotFoundError is *not* retried)
+
+`prefetch()` pulls the frames of many sites in a few set-based queries
+(used by tasks/ssv_worker.py:prefetch_ssv_group); only DBSource has it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import date
+
+import pandas as pd
+import requests
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import settings
+from database.db import NotFoundError, sync_engine
+from database.ssv import (
+    all_data_frame, grid_frame, site_info_frame, site_kpi_frame,
+    sites_info_frame, sites_kpi_frame,
+)
+from database.kpi_hist import kpi_hist_frame
+from infrustructure.arrow_stream import ARROW_STREAM, arrow_available, read_arrow_frame
+from .api_client import get_api_client
+
+log = logging.getLogger("ssv.data_source")
+
+
+class SSVDataSource(ABC):
+    """Interface – every method returns a DataFrame or raises NotFoundError."""
+
+    @abstractmethod
+    def site_info(self, siteid: str) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def site_kpi(self, siteid: str, query_date: date) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def all_data(self, siteid_cellids: list[str], query_date: date) -> pd.DataFrame:
+        ...
+
+    def kpi_hist(self, siteid_cellids: list[str], query_date: date) -> pd.DataFrame | None:
+        """Pre-binned KPI counts (database/kpi_hist.py); None → not available here."""
+        return None
+
+    def grid_cells(self, siteid_cellids: list[str], query_date: date,
+                   grid_size: float = 50) -> pd.DataFrame | None:
+        """SQL-side 50 m aggregates (database/ssv.py:grid_frame); None → not available."""
+        return None
+
+    def prefetch(self, siteids: list[str], query_date: date, *,
+                 sql_grid: bool = False) -> dict[str, dict[str, pd.DataFrame]] | None:
+        """siteid → the frames SSV4G._fetch_frames would build; None → not available."""
+        return None
+
+
+# ──────────────────────────────────────────────────────────
+# 1) in-process – sync engine
+# ──────────────────────────────────────────────────────────
+class DBSource(SSVDataSource):
+    def __init__(self, engine=sync_engine):
+        self.engine = engine
+
+    def site_info(self, siteid: str) -> pd.DataFrame:
+        with self.engine.connect() as conn:
+            return site_info_frame(int(siteid), conn)
+
+    def site_kpi(self, siteid: str, query_date: date) -> pd.DataFrame:
+        with self.engine.connect() as conn:
+            return site_kpi_frame(str(siteid), query_date, conn)
+
+    def all_data(self, siteid_cellids: list[str], query_date: date) -> pd.DataFrame:
+        with self.engine.connect() as conn:
+            return all_data_frame(siteid_cellids, query_date, conn)
+
+    def kpi_hist(self, siteid_cellids: list[str], query_date: date) -> pd.DataFrame | None:
+        with self.engine.connect() as conn:
+            return kpi_hist_frame(siteid_cellids, query_date, conn)
+
+    def grid_cells(self, siteid_cellids: list[str], query_date: date,
+                   grid_size: float = 50) -> pd.DataFrame | None:
+        with self.engine.connect() as conn:
+            return grid_frame(siteid_cellids, query_date, conn, grid_size=grid_size)
+
+    def prefetch(self, siteids: list[str], query_date: date, *,
+                 sql_grid: bool = False) -> dict[str, dict[str, pd.DataFrame]] | None:
+        """
+        One query per table for all *siteids*, split by site afterwards.
+        Sites without cells, KPI rows or samples are left out, so their
+        items go down the normal path and fail with the usual NotFoundError.
+        """
+        with self.engine.connect() as conn:
+            info = sites_info_frame([int(s) for s in siteids], conn)
+            if info.empty:
+                return {}
+            cells = info["siteid_cellid"].unique().tolist()
+            kpi  = sites_kpi_frame([str(s) for s in siteids], query_date, conn)
+            hist = kpi_hist_frame(cells, query_date, conn)
+            try:
+                samples_name = "grid" if sql_grid else "all_data"
+                samples = (grid_frame(cells, query_date, conn) if sql_grid
+                           else all_data_frame(cells, query_date, conn))
+            except NotFoundError:
+                return {}
+
+        # cell → siteid, from celldb; kpi_data only has the '<siteid>-…' prefix
+        site_of_cell = info.set_index("siteid_cellid")["siteid"].astype(str)
+        site_of_cell = site_of_cell[~site_of_cell.index.duplicated()]
+        parts = {
+            "site_info": info.groupby(info["siteid"].astype(str), sort=False),
+            "kpi":       kpi.groupby(kpi["siteid_cellid"].str.split("-", n=1).str[0], sort=False),
+            "kpi_hist":  hist.groupby(hist["siteid_cellid"].map(site_of_cell), sort=False),
+            samples_name: samples.groupby(samples["siteid_cellid"].map(site_of_cell), sort=False),
+        }
+        split = {name: {str(site): df.reset_index(drop=True) for site, df in grouped}
+                 for name, grouped in parts.items()}
+
+        out: dict[str, dict[str, pd.DataFrame]] = {}
+        for site in map(str, siteids):
+            frames = {name: by_site[site] for name, by_site in split.items() if site in by_site}
+            if {"site_info", "kpi", samples_name} <= frames.keys():
+                frames.setdefault("kpi_hist", hist.iloc[0:0])
+                out[site] = frames
+        return out
+
+
+# ──────────────────────────────────────────────────────────
+# 2) loopback HTTP – BASE_URL/ssv/...
+# ──────────────────────────────────────────────────────────
+class HTTPSource(SSVDataSource):
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", *, timeout: int = 10):
+        self.client = get_api_client(
+            base_url,
+            pool_size=settings.SSV_HTTP_POOL_SIZE,
+            retries=settings.SSV_HTTP_RETRIES,
+        )
+        self.SSV_URL = self.client.SSV_URL
+        self.timeout = timeout
+
+    def query_api(self, path: str, *, params: dict | None = None,
+                  as_df: bool = False, arrow: bool = False,
+                  timeout: int | None = None):
+        """
+        *arrow=True* asks for an Arrow IPC stream; the server may still answer
+        JSON (no pyarrow there), so the Content-Type decides how to decode.
+        """
+        url = f"{self.SSV_URL}/{path}"
+        headers = {"Accept": f"{ARROW_STREAM}, application/json;q=0.9"} \
+            if arrow and arrow_available() else None
+        r   = self.client.get(path, params=params, headers=headers,
+                              timeout=timeout or self.timeout)
+
+        if r.status_code == 404:
+            raise NotFoundError(r.json().get("detail", r.text))
+        if r.status_code != 200:
+            raise RuntimeError(f"GET {url} -> {r.status_code}: {r.text}")
+
+        if r.headers.get("content-type", "").startswith(ARROW_STREAM):
+            return read_arrow_frame(r.content)
+
+        payload = r.json()
+        return pd.DataFrame(payload) if as_df else payload
+
+    def site_info(self, siteid: str) -> pd.DataFrame:
+        return self.query_api(f"get_site_info/{siteid}", as_df=True)
+
+    def site_kpi(self, siteid: str, query_date: date) -> pd.DataFrame:
+        return self.query_api(
+            "get_site_kpi",
+            params={"siteid": siteid, "date": query_date},
+            as_df=True,
+        )
+
+    def all_data(self, siteid_cellids: list[str], query_date: date) -> pd.DataFrame:
+        return self.query_api(
+            "get_all_data_by_list",
+            params={"siteid_cellids": json.dumps(siteid_cellids), "date": query_date},
+            as_df=True,
+            arrow=True,
+        )
+
+    def grid_cells(self, siteid_cellids: list[str], query_date: date,
+                   grid_size: float = 50) -> pd.DataFrame | None:
+        return self.query_api(
+            "grid_by_list",
+            params={"siteid_cellids": json.dumps(siteid_cellids), "date": query_date,
+                    "grid_size": grid_size},
+            as_df=True,
+        )
+
+
+# ──────────────────────────────────────────────────────────
+# 3) primary → fallback
+# ──────────────────────────────────────────────────────────
+class FallbackSource(SSVDataSource):
+    # errors that mean "this source is unreachable", not "there is no data"
+    UNREACHABLE = (SQLAlchemyError, requests.RequestException)
+
+    def __init__(self, primary: SSVDataSource, fallback: SSVDataSource):
+        self.primary, self.fallback = primary, fallback
+
+    def _call(self, name: str, *args):
+        try:
+            return getattr(self.primary, name)(*args)
+        except self.UNREACHABLE as exc:
+            log.warning("%s.%s failed (%s) – falling back to %s",
+                        type(self.primary).__name__, name, exc,
+                        type(self.fallback).__name__)
+            return getattr(self.fallback, name)(*args)
+
+    def site_info(self, siteid: str) -> pd.DataFrame:
+        return self._call("site_info", siteid)
+
+    def site_kpi(self, siteid: str, query_date: date) -> pd.DataFrame:
+        return self._call("site_kpi", siteid, query_date)
+
+    def all_data(self, siteid_cellids: list[str], query_date: date) -> pd.DataFrame:
+        return self._call("all_data", siteid_cellids, query_date)
+
+    def kpi_hist(self, siteid_cellids: list[str], query_date: date) -> pd.DataFrame | None:
+        return self._call("kpi_hist", siteid_cellids, query_date)
+
+    def grid_cells(self, siteid_cellids: list[str], query_date: date,
+                   grid_size: float = 50) -> pd.DataFrame | None:
+        return self._call("grid_cells", siteid_cellids, query_date, grid_size)
+
+    def prefetch(self, siteids: list[str], query_date: date, *,
+                 sql_grid: bool = False) -> dict[str, dict[str, pd.DataFrame]] | None:
+        try:
+            return self.primary.prefetch(siteids, query_date, sql_grid=sql_grid)
+        except self.UNREACHABLE as exc:
+            log.warning("%s.prefetch failed (%s) – items will fetch on their own",
+                        type(self.primary).__name__, exc)
+            return None
+
+
+def make_data_source(kind: str = "db", base_url: str = "http://127.0.0.1:8000") -> SSVDataSource:
+    """
+    "db"   → DBSource with HTTPSource as fallback
+    "http" → HTTPSource only
+    """
+    match kind.lower():
+        case "db":
+            return FallbackSource(DBSource(), HTTPSource(base_url))
+        case "http":
+            return HTTPSource(base_url)
+        case _:
+            raise ValueError(f"unknown SSV data source: {kind}")
@@ -0,0 +1,118 @@
+# BACKEND/tasks/SSV/grid_vector.py
+"""
+50 m coverage grid as vector data instead of a rendered PNG.
+
+Input is the grid-row frame of database/ssv.py:grid_by_list
+
+    siteid_cellid, kpi, x, y, count, mean, median, p10      (x / y in EPSG:3857)
+
+either straight from SQL or built from raw samples with grid_from_samples().
+grid_geojson() turns it into one GeoJSON FeatureCollection:
+
+* one Polygon feature per (cell, KPI, square), lon/lat rounded to 1e-6°
+* properties: cell, kpi, count, mean, median, p10
+* foreign members "grid_size" and "legend" ({kpi: [{min, max, colour}]},
+  null = open bound) – the client colours squares without a round trip
+"""
+from __future__ import annotations
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from .projection import get_transformer
+from .RangeDict import COUNT_Ranges, LTE_Ranges, RangeDict, bounds
+
+GRID_COLUMNS = ("siteid_cellid", "kpi", "x", "y", "count", "mean", "median", "p10")
+_STATS = ("mean", "median", "p10")
+_DECIMALS = 6                                # ~0.1 m at the equator
+
+
+def grid_from_samples(
+    samples: pd.DataFrame,
+    bs_x: float,
+    bs_y: float,
+    kpis,
+    *,
+    cell: str,
+    grid_size: float = 50,
+) -> pd.DataFrame:
+    """
+    Same rows the SQL grid returns, for one cell's projected samples
+    (x / y columns): squares anchored at the base station, NaNs dropped.
+    """
+    # the plotting module drags matplotlib in – the API only needs grid_geojson
+    from .SpatialKPIDensity import aggregate_squares
+
+    xs, ys = samples["x"].to_numpy(np.float64), samples["y"].to_numpy(np.float64)
+    ix = np.round((xs - bs_x) / grid_size).astype(np.int64)
+    iy = np.round((ys - bs_y) / grid_size).astype(np.int64)
+
+    parts = []
+    for kpi in kpis:
+        if kpi not in samples.columns:
+            continue
+        vals = samples[kpi].to_numpy()
+        sx, sy, count = aggregate_squares(ix, iy, vals, "count")
+        if not count.size:
+            continue
+        part = {"x": bs_x + grid_size * sx, "y": bs_y + grid_size * sy,
+                "count": count.astype(np.int64)}
+        for how in _STATS:
+            part[how] = aggregate_squares(ix, iy, vals, how)[2]
+        parts.append(pd.DataFrame({"siteid_cellid": cell, "kpi": kpi, **part}))
+
+    if not parts:
+        return pd.DataFrame(columns=list(GRID_COLUMNS))
+    return pd.concat(parts, ignore_index=True)[list(GRID_COLUMNS)]
+
+
+def _legend(ranges: RangeDict) -> list[dict]:
+    def bound(v):
+        return None if math.isinf(v) else v
+    return [{"min": bound(lo), "max": bound(hi), "colour": colour}
+            for (lo, hi), colour in ((bounds(key), colour) for key, colour in ranges.items())]
+
+
+def grid_geojson(grid: pd.DataFrame, grid_size: float = 50) -> dict:
+    """FeatureCollection of the grid squares (see module docstring)."""
+    x = grid["x"].to_numpy(np.float64)
+    y = grid["y"].to_numpy(np.float64)
+    half = grid_size / 2
+
+    # the two opposite corners of every square, unprojected in one call each
+    to_wgs84 = get_transformer("EPSG:3857", "EPSG:4326")
+    lon0, lat0 = to_wgs84.transform(x - half, y - half)
+    lon1, lat1 = to_wgs84.transform(x + half, y + half)
+    lon0, lat0, lon1, lat1 = (np.round(a, _DECIMALS).tolist() for a in (lon0, lat0, lon1, lat1))
+
+    cells  = grid["siteid_cellid"].astype(str).tolist()
+    kpis   = grid["kpi"].astype(str).tolist()
+    counts = grid["count"].astype(np.int64).tolist()
+    stats  = {how: [None if math.isnan(v) else round(v, 3)
+                    for v in grid[how].to_numpy(np.float64).tolist()]
+              for how in _STATS}
+
+    features = []
+    for i in range(len(grid)):
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [[
+                [lon0[i], lat0[i]], [lon1[i], lat0[i]], [lon1[i], lat1[i]],
+                [lon0[i], lat1[i]], [lon0[i], lat0[i]],
+            ]]},
+            "properties": {"cell": cells[i], "kpi": kpis[i], "count": counts[i],
+                           **{how: stats[how][i] for how in _STATS}},
+        })
+
+    legend = {kpi: _legend(LTE_Ranges[kpi]) for kpi in dict.fromkeys(kpis) if kpi in LTE_Ranges}
+    legend["count"] = _legend(COUNT_Ranges)
+    return {"type": "FeatureCollection", "grid_size": grid_size,
+            "legend": legend, "features": features}
+
+
+def dumps(collection: dict) -> str:
+    """Compact JSON – no whitespace between tokens."""
+    return json.dumps(collection, separators=(",", ":"))
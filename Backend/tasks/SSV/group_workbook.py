@@ -0,0 +1,109 @@
+# BACKEND/tasks/SSV/group_workbook.py
+"""
+One workbook per TaskGroup, one sheet per site (settings.SSV_GROUP_WORKBOOK).
+
+Items don't write their own .xlsx; each leaves its laid-out sheet behind
+
+    outputs/<gid>/<siteid>_<date>_4G.sheet/
+        layout.pkl          (title, SheetLayout) – images replaced by file names
+        map_000.png …       encoded map images
+
+and when the group finishes, assemble_group_workbook() streams every sheet
+into outputs/<gid>/<gid>_SSV_4G.xlsx through the configured report engine:
+one layout in memory at a time, images read from disk only when the file is
+written, one shared style table for the whole group.  That runs in its own Celery
+task (tasks.ssv_worker.finalize_ssv_group); if it fails, split_group_workbook()
+writes the per-site workbooks instead, so raw sheet dirs never get zipped.
+"""
+from __future__ import annotations
+
+import logging
+import pickle
+import shutil
+import uuid
+from pathlib import Path
+
+from .report_layout import SheetLayout
+from .report_writer import make_report_writer
+
+log = logging.getLogger("ssv.group_workbook")
+
+SHEET_SUFFIX = "sheet"                       # <siteid>_<date>_4G.sheet/
+
+
+def save_sheet(sheet_dir: str | Path, title: str, layout: SheetLayout) -> Path:
+    """Write one site's sheet artifact (atomically – the directory appears complete)."""
+    final = Path(sheet_dir)
+    tmp = final.with_name(f".{final.name}.{uuid.uuid4().hex}.tmp")
+    tmp.mkdir(parents=True)
+
+    images = []
+    for i, spec in enumerate(layout.images):
+        name = f"map_{i:03d}." + ("png" if spec.data[:4] == b"\x89PNG" else "jpg")
+        (tmp / name).write_bytes(spec.data)
+        images.append(spec._replace(data=name))
+    with open(tmp / "layout.pkl", "wb") as fh:
+        pickle.dump((title, layout._replace(images=images)), fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    shutil.rmtree(final, ignore_errors=True)
+    tmp.replace(final)                           # same filesystem → atomic
+    return final
+
+
+def load_sheet(sheet_dir: Path) -> tuple[str, SheetLayout]:
+    """(title, layout) with every image pointing at its file."""
+    with open(sheet_dir / "layout.pkl", "rb") as fh:
+        title, layout = pickle.load(fh)
+    images = [spec._replace(data=str(sheet_dir / spec.data)) for spec in layout.images]
+    return title, layout._replace(images=images)
+
+
+def assemble_group_workbook(raw_root: Path, engine: str) -> Path | None:
+    """
+    Stream every sheet artifact under *raw_root* (outputs/<gid>) into one
+    workbook, then drop the artifacts.  None when there is nothing to assemble.
+    """
+    sheets = sorted(p for p in raw_root.glob(f"*.{SHEET_SUFFIX}") if p.is_dir())
+    if not sheets:
+        return None
+
+    out = raw_root / f"{raw_root.name}_SSV_4G.xlsx"
+    titles: set[str] = set()
+    with make_report_writer(engine, str(out)) as writer:
+        for sheet_dir in sheets:
+            title, layout = load_sheet(sheet_dir)
+            title = title[:31]
+            if title in titles:                  # same site / date queued twice
+                log.warning("duplicate sheet %r in %s – skipped", title, raw_root)
+                continue
+            titles.add(title)
+            writer.add_sheet(title, layout)
+
+    for sheet_dir in sheets:                     # images are read on close – delete after
+        shutil.rmtree(sheet_dir, ignore_errors=True)
+    log.info("assembled %d sheets into %s", len(titles), out)
+    return out
+
+
+def split_group_workbook(raw_root: Path, engine: str) -> list[Path]:
+    """
+    Fallback when the group workbook can't be assembled: one workbook per
+    sheet artifact (<siteid>_<date>_4G.xlsx, as without SSV_GROUP_WORKBOOK),
+    then drop the artifacts.  Raises if any site can't be written.
+    """
+    sheets = sorted(p for p in raw_root.glob(f"*.{SHEET_SUFFIX}") if p.is_dir())
+    written = []
+    for sheet_dir in sheets:
+        title, layout = load_sheet(sheet_dir)
+        out = sheet_dir.with_suffix(".xlsx")
+        with make_report_writer(engine, str(out)) as writer:
+            writer.add_sheet(title[:31], layout)
+        shutil.rmtree(sheet_dir, ignore_errors=True)
+        written.append(out)
+    log.info("split %d sheets into per-site workbooks in %s", len(written), raw_root)
+    return written
+
+
+def has_sheets(raw_root: Path) -> bool:
+    """True while *raw_root* still holds sheet artifacts (group not finalised yet)."""
+    return any(p.is_dir() for p in raw_root.glob(f"*.{SHEET_SUFFIX}"))
@@ -0,0 +1,40 @@
+# BACKEND/tasks/SSV/projection.py
+"""
+Shared pyproj set-up for the SSV pipeline.
+
+* PROJ network access (grid downloads from cdn.proj.org) follows
+  settings.SSV_PROJ_NETWORK – off unless asked for
+* get_transformer() – one Transformer per (src, dst) *per thread*:
+  pyproj Transformers must not be shared between threads, and building
+  one costs a CRS-database lookup, so each Celery thread keeps its own
+* to_web_mercator() – WGS84 lon/lat → EPSG:3857 x/y, scalars or arrays
+"""
+from __future__ import annotations
+
+import os
+import threading
+
+import pyproj
+from pyproj import Transformer
+
+from config import settings
+
+os.environ.setdefault("PROJ_LIB", pyproj.datadir.get_data_dir())
+pyproj.network.set_network_enabled(settings.SSV_PROJ_NETWORK)
+
+_local = threading.local()
+
+
+def get_transformer(src: str = "EPSG:4326", dst: str = "EPSG:3857") -> Transformer:
+    cache = getattr(_local, "transformers", None)
+    if cache is None:
+        cache = _local.transformers = {}
+    tr = cache.get((src, dst))
+    if tr is None:
+        tr = cache[(src, dst)] = Transformer.from_crs(src, dst, always_xy=True)
+    return tr
+
+
+def to_web_mercator(lon, lat):
+    """(lon, lat) in degrees → (x, y) in EPSG:3857 metres."""
+    return get_transformer().transform(lon, lat)
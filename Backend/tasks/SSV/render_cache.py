@@ -0,0 +1,242 @@
+# BACKEND/tasks/SSV/render_cache.py
+"""
+Rendered KPI maps, keyed by what went into them.
+
+plot_key() hashes everything a map image depends on – the plotted grid
+points / values, the plot window (BS position, extent, azimuth, beamwidth,
+grid size, aggregate), the colour ranges, the render profile and the basemap
+source – so a repeated batch, or a site that shows up in several groups,
+gets its images back without touching matplotlib.
+
+* RenderStore – one SQLite file (WAL, shared by every worker process and
+                thread), encoded image bytes per key, `last_used` LRU
+                eviction once the file grows past *max_bytes*
+* counters    – hits / misses / render seconds spent and saved, kept in the
+                same file so stats() sees every process
+                (GET /ssv_task/render_cache)
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import settings
+
+log = logging.getLogger("ssv.render_cache")
+
+KEY_VERSION = "2"                        # bump when the drawing code changes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    key        TEXT PRIMARY KEY,
+    data       BLOB NOT NULL,
+    render_s   REAL NOT NULL,
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS renders_last_used ON renders (last_used);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL);
+"""
+_COUNTERS = ("hits", "misses", "render_s", "saved_s")
+
+
+def plot_key(plot: dict, profile: str, kpi: str, points: dict) -> str:
+    """sha256 of one map's inputs (a render_pool.py job layer + its cell's plot/profile)."""
+    from .RangeDict import COUNT_Ranges, LTE_Ranges
+    from .SpatialKPIDensity import RENDER_PROFILES
+
+    ranges = COUNT_Ranges if plot.get("aggregate") == "count" else LTE_Ranges[kpi]
+    h = hashlib.sha256()
+    h.update(repr((
+        KEY_VERSION,
+        sorted(plot.items()),
+        tuple(RENDER_PROFILES[profile]),
+        kpi,
+        list(ranges.items()),
+        settings.SSV_TILE_URL,
+    )).encode())
+    for name in ("x", "y", "value"):
+        h.update(np.ascontiguousarray(points[name]).tobytes())
+    return h.hexdigest()
+
+
+class RenderStore:
+    TOUCH_AFTER_S = 3600                 # refresh last_used at most hourly per image
+    EVICT_EVERY   = 64                   # puts between two size checks
+
+    def __init__(self, path: str | Path, *, max_bytes: int = 512 * 1024 ** 2):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()   # one connection per thread
+        self._puts = 0
+        self._puts_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[bytes, float]]:
+        """{key: (image bytes, render seconds)} of the keys that are stored."""
+        if not keys:
+            return {}
+        conn = self._conn()
+        found = {}
+        stale = []
+        now = time.time()
+        for i in range(0, len(keys), 500):              # SQLite host-parameter limit
+            chunk = keys[i:i + 500]
+            for key, data, render_s, last_used in conn.execute(
+                "SELECT key, data, render_s, last_used FROM renders"
+                f" WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                found[key] = (data, render_s)
+                if now - last_used > self.TOUCH_AFTER_S:
+                    stale.append(key)
+        if stale:
+            conn.executemany("UPDATE renders SET last_used=? WHERE key=?",
+                             [(now, key) for key in stale])
+        return found
+
+    def put_many(self, items: list[tuple[str, bytes, float]]) -> None:
+        """Store (key, image bytes, render seconds) triples."""
+        if not items:
+            return
+        now = time.time()
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO renders VALUES (?, ?, ?, ?)",
+            [(key, sqlite3.Binary(data), render_s, now) for key, data, render_s in items],
+        )
+        with self._puts_lock:
+            before = self._puts
+            self._puts += len(items)
+            due = self._puts // self.EVICT_EVERY != before // self.EVICT_EVERY
+        if due:
+            self.evict()
+
+    def size_bytes(self) -> int:
+        return self._conn().execute(
+            "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM renders"
+        ).fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least-recently-used images until the store fits *max_bytes*."""
+        conn = self._conn()
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        victims, freed = [], 0
+        for key, size in conn.execute(
+            "SELECT key, LENGTH(data) FROM renders ORDER BY last_used"
+        ):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM renders WHERE key=?", victims)
+        log.info("evicted %d rendered maps (%d bytes)", len(victims), freed)
+        return len(victims)
+
+    # ------------------------------------------------------------------
+    # counters
+    # ------------------------------------------------------------------
+    def count(self, **deltas: float) -> None:
+        """Add to the shared counters, e.g. count(hits=3, saved_s=1.2)."""
+        self._conn().executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [(name, float(delta)) for name, delta in deltas.items() if delta],
+        )
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        values = dict.fromkeys(_COUNTERS, 0.0)
+        values.update(conn.execute("SELECT name, value FROM counters"))
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM renders"
+        ).fetchone()
+        lookups = values["hits"] + values["misses"]
+        return {
+            "hits": int(values["hits"]),
+            "misses": int(values["misses"]),
+            "hit_rate": round(values["hits"] / lookups, 4) if lookups else None,
+            "render_s": round(values["render_s"], 1),   # spent rendering misses
+            "saved_s": round(values["saved_s"], 1),     # those renders, not repeated on hits
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# ──────────────────────────────────────────────────────────
+# one store per process
+# ──────────────────────────────────────────────────────────
+_store: RenderStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_render_store() -> RenderStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = settings.SSV_RENDER_CACHE or \
+                Path(__file__).resolve().parents[2] / "cache" / "renders.sqlite"
+            _store = RenderStore(path, max_bytes=settings.SSV_RENDER_CACHE_MAX_MB * 1024 ** 2)
+        return _store
+
+
+def render_cached(jobs: list[dict]) -> dict[str, dict[str, bytes]]:
+    """
+    render_cells(), skipping every map the store already holds; counts hits /
+    misses.  Maps drawn over an incomplete basemap (tile fetch failed,
+    offline miss) are returned but not stored.
+    """
+    from .render_pool import render_jobs
+
+    store = get_render_store()
+    keys = {(job["cell"], kpi): plot_key(job["plot"], job["profile"], kpi, points)
+            for job in jobs for kpi, points in job["layers"]}
+    cached = store.get_many(list(dict.fromkeys(keys.values())))
+
+    images: dict[str, dict[str, bytes]] = {job["cell"]: {} for job in jobs}
+    todo, saved_s = [], 0.0
+    for job in jobs:
+        missing = []
+        for kpi, points in job["layers"]:
+            hit = cached.get(keys[(job["cell"], kpi)])
+            if hit is None:
+                missing.append((kpi, points))
+            else:
+                images[job["cell"]][kpi] = hit[0]
+                saved_s += hit[1]
+        if missing:
+            todo.append({**job, "layers": missing})
+
+    t0 = time.perf_counter()
+    fresh, holes = render_jobs(todo) if todo else ({}, set())
+    spent = time.perf_counter() - t0
+    n_fresh = sum(len(maps) for maps in fresh.values())
+    per_map = spent / n_fresh if n_fresh else 0.0
+
+    for cell, maps in fresh.items():
+        images[cell].update(maps)
+    if holes:
+        log.info("not caching maps of %s – basemap tiles missing", ", ".join(sorted(holes)))
+    store.put_many([(keys[(cell, kpi)], data, per_map)
+                    for cell, maps in fresh.items() if cell not in holes
+                    for kpi, data in maps.items()])
+    store.count(hits=len(keys) - n_fresh, misses=n_fresh, render_s=spent, saved_s=saved_s)
+    return images
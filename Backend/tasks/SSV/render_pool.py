@@ -0,0 +1,115 @@
+# BACKEND/tasks/SSV/render_pool.py
+"""
+Map rendering off the Celery threads' GIL.
+
+SSV4G.make_plots turns every cell into a compact, picklable job
+
+    {"cell": "69491-11",
+     "plot":    {bs_lat, bs_lon, azimuth, beamwidth, radius, grid_size, extent_km,
+                 aggregate, aggregated},          # aggregated: SQL-grid squares, not samples
+     "profile": "excel",                      # SpatialKPIDensity.RENDER_PROFILES
+     "layers":  [(kpi, {"x": float64[], "y": float64[], "value": float32[]}), ...]}
+
+and render_cells() draws them – one CellBackground per cell, encoded image
+bytes per KPI (render_jobs() also names the cells drawn over a basemap with
+missing tiles).
+
+* enough maps → a warm, per-process pool of *spawned* render processes
+  (fork is unsafe under the threaded worker); one job per cell
+* few maps, pool disabled or broken → rendered right here, in-thread
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+from config import settings
+
+log = logging.getLogger("ssv.render_pool")
+
+Job = dict                                   # see module docstring
+
+
+def render_cell(job: Job) -> tuple[dict[str, bytes], bool]:
+    """
+    Draw every KPI layer of one cell on a shared background
+    → ({kpi: image bytes}, basemap complete).
+    """
+    from .RangeDict import LTE_Ranges
+    from .SpatialKPIDensity import CellBackground, SpatialKPIDensityPlot
+
+    background = None
+    images: dict[str, bytes] = {}
+    for kpi, points in job["layers"]:
+        plotter = SpatialKPIDensityPlot(
+            **job["plot"],
+            grid_points=points, grid_value="value",
+            kpi_col=kpi, kpi_name=kpi.upper(),
+            kpi_range_dict=LTE_Ranges[kpi],
+        )
+        if background is None:
+            background = CellBackground(plotter, profile=job.get("profile", "excel"))
+        images[kpi] = background.render_bytes(plotter)
+    return images, background is None or background.complete
+
+
+def _warm() -> None:
+    # pay the matplotlib / pyproj / tile-store start-up once per process
+    os.environ["MPLBACKEND"] = "Agg"
+    from .SpatialKPIDensity import SpatialKPIDensityPlot  # noqa: F401
+    from .tile_cache import get_tile_fetcher
+    get_tile_fetcher()
+
+
+# ──────────────────────────────────────────────────────────
+# one pool per worker process
+# ──────────────────────────────────────────────────────────
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.SSV_RENDER_PROCESSES or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm,
+            )
+        return _pool
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_cells(jobs: list[Job]) -> dict[str, dict[str, bytes]]:
+    """{cell: {kpi: image bytes}} for every job, in a render process when worth it."""
+    return render_jobs(jobs)[0]
+
+
+def render_jobs(jobs: list[Job]) -> tuple[dict[str, dict[str, bytes]], set[str]]:
+    """render_cells() + the cells whose basemap had missing tiles."""
+    maps = sum(len(job["layers"]) for job in jobs)
+    if not settings.SSV_RENDER_POOL or maps < settings.SSV_RENDER_POOL_MIN_MAPS:
+        results = {job["cell"]: render_cell(job) for job in jobs}
+    else:
+        pool = _get_pool()
+        try:
+            futures = {job["cell"]: pool.submit(render_cell, job) for job in jobs}
+            results = {cell: fut.result() for cell, fut in futures.items()}
+        except BrokenProcessPool:
+            log.exception("render pool broke – rendering in-thread")
+            _drop_pool(pool)
+            results = {job["cell"]: render_cell(job) for job in jobs}
+    images = {cell: maps for cell, (maps, _) in results.items()}
+    return images, {cell for cell, (_, complete) in results.items() if not complete}
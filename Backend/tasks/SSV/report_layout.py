@@ -0,0 +1,188 @@
+# BACKEND/tasks/SSV/report_layout.py
+"""
+Layout plan of the SSV one-page report, computed before anything is written.
+
+onepage_layout() walks the report once and returns a SheetLayout – every
+value, style name, image, chart, column width and row height by position –
+so a writer (report_writer.py) can stream the sheet top to bottom instead of
+poking cells in random order.
+
+* styles are *names* into STYLES (engine-neutral specs), registered once per
+  workbook by the writer instead of new Font / Fill / Border objects per cell
+* section banners span their columns with centerContinuous, not merges
+* rows default to 18 pt; only rows that differ are listed
+"""
+from __future__ import annotations
+
+from typing import Any, NamedTuple
+
+# ──────────────────────────────────────────────────────────
+# styles
+# ──────────────────────────────────────────────────────────
+_TD = {"border": "BBBBBB", "align": "center", "valign": "center", "wrap": True}
+
+STYLES: dict[str, dict] = {
+    "ssv_section": {"bold": True, "color": "FFFFFF", "size": 16, "fill": "3E82FC",
+                    "align": "centerContinuous"},
+    "ssv_cell":    {"bold": True, "color": "3E82FC"},
+    "ssv_kpi":     {"bold": True},
+    "ssv_th":      {**_TD, "bold": True, "fill": "D1E6FA"},
+    "ssv_band1":   {**_TD, "fill": "F4F8FB"},
+    "ssv_band2":   {**_TD, "fill": "E9F1F7"},
+}
+
+ROW_HEIGHT   = 18                   # every row unless listed in row_heights
+SPACER_ROW   = 12
+COL_WIDTH    = 24                   # columns B … AC before tables are fitted
+SECTION_SPAN = 18
+IMAGE_PX     = 500                  # map images, square
+IMAGE_ROWS   = 15                   # rows reserved under a map
+
+
+class ImageSpec(NamedTuple):
+    row: int
+    col: int
+    data: bytes | str               # encoded PNG / JPEG, or the path of one
+    width: int
+    height: int
+
+
+class ChartSpec(NamedTuple):
+    row: int                        # anchor
+    col: int
+    table_row: int                  # 2-column [category | value] table, header row
+    table_col: int
+    n_rows: int                     # header included
+    title: str
+    y_max: float | None             # axis head-room, None = automatic
+
+
+class SheetLayout(NamedTuple):
+    rows: dict[int, list[tuple[int, Any, str | None]]]     # row → [(col, value, style)]
+    images: list[ImageSpec]
+    charts: list[ChartSpec]
+    col_widths: dict[int, float]
+    row_heights: dict[int, float]
+    zoom: int | None
+
+    @property
+    def last_row(self) -> int:
+        return max(self.rows, default=0)
+
+
+class LayoutBuilder:
+    """Cursor helpers for the report blocks; build() → SheetLayout."""
+
+    def __init__(self):
+        self.rows: dict[int, list[tuple[int, Any, str | None]]] = {}
+        self.images: list[ImageSpec] = []
+        self.charts: list[ChartSpec] = []
+        self.col_widths: dict[int, float] = {c: COL_WIDTH for c in range(2, 30)}
+        self.row_heights: dict[int, float] = {}
+        self.zoom: int | None = None
+
+    def put(self, row: int, col: int, value, style: str | None = None) -> None:
+        self.rows.setdefault(row, []).append((col, value, style))
+
+    def section(self, title: str, row: int, col: int = 2, span: int = SECTION_SPAN) -> int:
+        self.put(row, col, title, "ssv_section")
+        for c in range(col + 1, col + span):
+            self.put(row, c, None, "ssv_section")
+        return row + 2
+
+    def table(self, table: list[list], row: int, col: int, fit_columns: bool = False) -> int:
+        """Header row + banded body; returns the table's last row."""
+        for i, row_data in enumerate(table):
+            style = "ssv_th" if i == 0 else ("ssv_band1" if i % 2 == 0 else "ssv_band2")
+            for j, val in enumerate(row_data):
+                self.put(row + i, col + j, val, style)
+        if fit_columns:
+            max_lens = [max(len(str(r[i])) for r in table) for i in range(len(table[0]))]
+            for i, l in enumerate(max_lens):
+                self.col_widths[col + i] = max(10, min(30, l + 4))
+        return row + len(table) - 1
+
+    def image(self, data: bytes, row: int, col: int, size: int = IMAGE_PX) -> None:
+        self.images.append(ImageSpec(row, col, data, size, size))
+
+    def bar_chart(self, row: int, col: int, table_row: int, table_col: int,
+                  table: list[list], title: str) -> None:
+        peak = max((float(r[1]) for r in table[1:]), default=0.0)
+        self.charts.append(ChartSpec(row, col, table_row, table_col, len(table), title,
+                                     peak * 1.2 if peak > 0 else None))
+
+    def build(self) -> SheetLayout:
+        for cells in self.rows.values():
+            cells.sort(key=lambda cell: cell[0])
+        return SheetLayout(dict(sorted(self.rows.items())), self.images, self.charts,
+                           self.col_widths, self.row_heights, self.zoom)
+
+
+def _range_table(source_tbl: list[list]) -> list[list]:
+    """[Range | %] rows of a make_tables() distribution table."""
+    trimmed = [["Range", "%"]]
+    for row in source_tbl[1:]:                   # skip header
+        if len(row) < 3:
+            continue
+        try:
+            pct = float(row[2])
+        except (TypeError, ValueError):
+            continue
+        trimmed.append([str(row[0]).strip(), pct])
+    return trimmed
+
+
+def onepage_layout(
+    title: str,
+    overview: list[list],
+    kpi_summary: list[list],
+    tables: dict[str, dict[str, list[list]]],
+    plots: dict[str, dict[str, bytes]],
+) -> SheetLayout:
+    """
+    The one-pager: overview tables on top, then for every cell / KPI
+    map → 2-column table → single-series bar chart.
+    """
+    b = LayoutBuilder()
+    cur = b.section(title, 2) + 2
+
+    # ── 1.  OVERVIEW ─────────────────────────────────────────────
+    cur = b.section("Overview - Site Info", cur)
+    cur = b.table(overview, cur, 2, fit_columns=True) + 3
+
+    cur = b.section("Overview - KPI Summary", cur)
+    cur = b.table(kpi_summary, cur, 2, fit_columns=True) + 3
+
+    # ── 2.  COVERAGE & PERFORMANCE (every cell / KPI) ────────────
+    cur = b.section("Coverage and Performances", cur) + 1
+
+    for cell, kpi_dict in tables.items():
+        b.put(cur, 2, f"Cell: {cell}", "ssv_cell")
+        cur += 1
+
+        for kpi, source_tbl in kpi_dict.items():
+            b.put(cur, 2, kpi.upper(), "ssv_kpi")
+            cur += 1
+
+            # (a)  map — only if make_plots() actually produced one
+            if kpi in plots.get(cell, {}):
+                b.image(plots[cell][kpi], cur, 2)
+            else:
+                b.row_heights[cur] = SPACER_ROW
+
+            # (b)  [Range | %] table right of the map
+            tbl_col = 2 + 6 + 1
+            trimmed = _range_table(source_tbl)
+            tbl_end = b.table(trimmed, cur, tbl_col, fit_columns=True)
+
+            # (c)  bar chart – only if at least one row is > 0
+            if len(trimmed) > 1 and any(r[1] > 0 for r in trimmed[1:]):
+                b.bar_chart(cur, tbl_col + 3, cur, tbl_col, trimmed,
+                            title=f"{kpi.upper()} Distribution")
+
+            # cursor below the image / table / chart cluster
+            cur = max(cur + IMAGE_ROWS, tbl_end) + 12
+            b.row_heights[cur] = SPACER_ROW
+            b.zoom = 70
+
+    return b.build()
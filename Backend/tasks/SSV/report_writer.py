@@ -0,0 +1,361 @@
+# BACKEND/tasks/SSV/report_writer.py
+"""
+Writes SheetLayouts (report_layout.py) to an .xlsx file.
+
+The report code only talks to the ReportWriter interface; the engine comes
+from settings.SSV_REPORT_ENGINE via make_report_writer():
+
+* "openpyxl"   – write-only workbook, STYLES registered once as named
+                 styles, rows streamed in layout order
+* "xlsxwriter" – constant_memory workbook (each row goes to a temp file as
+                 soon as the next one starts), one Format per style, images
+                 embedded straight from their bytes; needs XlsxWriter,
+                 falls back to openpyxl without it
+
+    with make_report_writer("xlsxwriter", path) as writer:
+        writer.add_sheet("SSV 4G Report", layout)
+
+Benchmark both engines on one site:
+
+    python -m tasks.SSV.report_writer bench --siteid 69491 --date 2025-01-01
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import logging
+import os
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from io import BytesIO
+
+import numpy as np
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import BarChart, Reference
+from openpyxl.chart.label import DataLabelList
+from openpyxl.drawing.image import Image as XLImage
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from PIL import Image as PILImage
+
+from config import settings
+from .report_layout import ROW_HEIGHT, STYLES, ChartSpec, ImageSpec, SheetLayout
+
+try:
+    import xlsxwriter
+    _HAS_XLSXWRITER = True
+except ImportError:
+    _HAS_XLSXWRITER = False
+
+log = logging.getLogger("ssv.report_writer")
+
+CHART_CM = (20, 11)                              # bar chart width × height
+
+
+def _named_style(name: str, spec: dict) -> NamedStyle:
+    style = NamedStyle(name=name)
+    style.font = Font(name="Calibri", size=spec.get("size", 11),
+                      bold=spec.get("bold", False), color=spec.get("color"))
+    if "fill" in spec:
+        style.fill = PatternFill("solid", fgColor=spec["fill"])
+    if "border" in spec:
+        side = Side(style="thin", color=spec["border"])
+        style.border = Border(left=side, right=side, top=side, bottom=side)
+    style.alignment = Alignment(horizontal=spec.get("align"), vertical=spec.get("valign"),
+                                wrap_text=spec.get("wrap"))
+    return style
+
+
+def _bar_chart(ws, spec: ChartSpec) -> BarChart:
+    """Single-series column chart over a 2-column [category | value] table."""
+    first = spec.table_row + 1                   # first data row
+    last  = spec.table_row + spec.n_rows - 1
+    cats = Reference(ws, min_col=spec.table_col, min_row=first, max_row=last)
+    vals = Reference(ws, min_col=spec.table_col + 1, min_row=first, max_row=last)
+
+    chart = BarChart()
+    chart.type = "col"
+    chart.shape = 4
+    chart.width, chart.height = CHART_CM
+    chart.add_data(vals, titles_from_data=False, from_rows=False)  # single series
+    chart.set_categories(cats)
+
+    # ── axes ────────────────────────────────────────────────
+    chart.x_axis.title = None
+    chart.x_axis.tickLblPos = "low"
+    chart.x_axis.textRotation = 45
+    chart.x_axis.majorTickMark = "out"
+    chart.x_axis.majorGridlines = None
+    chart.x_axis.delete = False                  # make sure axis is visible
+
+    chart.y_axis.title = None
+    chart.y_axis.majorGridlines = None
+    chart.y_axis.delete = False
+    if spec.y_max is not None:                   # head-room above the tallest bar
+        chart.y_axis.scaling.max = spec.y_max
+
+    # ── labels & legend ─────────────────────────────────────
+    chart.dataLabels = DataLabelList()
+    chart.dataLabels.showVal = True              # numeric value on bars
+    chart.dataLabels.showSerName = False         # hide “Series1” etc.
+    chart.dataLabels.showCatName = False         # keep cat names only on x‑axis
+    chart.legend = None                          # hide redundant legend
+
+    chart.title = spec.title
+    chart.title_overlay = False
+    return chart
+
+
+class ReportWriter(ABC):
+    """Interface – add_sheet() per sheet, in order; close() writes the file."""
+
+    path: str
+
+    @abstractmethod
+    def add_sheet(self, title: str, layout: SheetLayout) -> None:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    def discard(self) -> None:
+        """Give up on the file: release the engine's temp files, leave no partial .xlsx."""
+        try:
+            self.close()
+        except Exception:
+            log.debug("closing discarded workbook %s failed", self.path, exc_info=True)
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+# ──────────────────────────────────────────────────────────
+# 1) openpyxl
+# ──────────────────────────────────────────────────────────
+class OpenpyxlReportWriter(ReportWriter):
+    def __init__(self, path: str):
+        self.path = path
+        self.wb = Workbook(write_only=True)
+        for name, spec in STYLES.items():
+            self.wb.add_named_style(_named_style(name, spec))
+
+    def add_sheet(self, title: str, layout: SheetLayout) -> None:
+        ws = self.wb.create_sheet(title[:31])        # Excel's sheet-name limit
+        ws.sheet_view.showGridLines = False
+        if layout.zoom:
+            ws.sheet_view.zoomScale = layout.zoom
+        ws.sheet_format.defaultRowHeight = ROW_HEIGHT
+        ws.sheet_format.customHeight = True
+
+        # sizing, drawings – all known up front, before the first row goes out
+        for col, width in layout.col_widths.items():
+            ws.column_dimensions[get_column_letter(col)].width = width
+        for row, height in layout.row_heights.items():
+            ws.row_dimensions[row].height = height
+        for spec in layout.images:
+            img = XLImage(BytesIO(spec.data) if isinstance(spec.data, bytes) else spec.data)
+            img.width, img.height = spec.width, spec.height
+            ws.add_image(img, f"{get_column_letter(spec.col)}{spec.row}")
+        for spec in layout.charts:
+            ws.add_chart(_bar_chart(ws, spec), f"{get_column_letter(spec.col)}{spec.row}")
+
+        for r in range(1, layout.last_row + 1):
+            cells = layout.rows.get(r)
+            if not cells:
+                ws.append([])
+                continue
+            row = [None] * cells[-1][0]
+            for col, value, style in cells:
+                cell = WriteOnlyCell(ws)
+                if style:
+                    cell.style = style
+                cell.value = value               # after the style: dates keep their format
+                row[col - 1] = cell
+            ws.append(row)
+
+    def close(self) -> None:
+        self.wb.save(self.path)
+
+
+# ──────────────────────────────────────────────────────────
+# 2) XlsxWriter
+# ──────────────────────────────────────────────────────────
+_CM_PX = 96 / 2.54                               # Excel's 96 dpi screen
+
+
+def _format_props(spec: dict) -> dict:
+    props = {"font_name": "Calibri", "font_size": spec.get("size", 11),
+             "bold": spec.get("bold", False)}
+    if "color" in spec:
+        props["font_color"] = "#" + spec["color"]
+    if "fill" in spec:
+        props.update(pattern=1, bg_color="#" + spec["fill"])
+    if "border" in spec:
+        props.update(border=1, border_color="#" + spec["border"])
+    if "align" in spec:
+        props["align"] = "center_across" if spec["align"] == "centerContinuous" else spec["align"]
+    if "valign" in spec:
+        props["valign"] = "vcenter" if spec["valign"] == "center" else spec["valign"]
+    if spec.get("wrap"):
+        props["text_wrap"] = True
+    return props
+
+
+class XlsxWriterReportWriter(ReportWriter):
+    def __init__(self, path: str):
+        self.path = path
+        self.wb = xlsxwriter.Workbook(path, {"constant_memory": True,
+                                             "nan_inf_to_errors": True})
+        self._formats: dict[tuple[str | None, str | None], object] = {}
+
+    def _format(self, style: str | None, num_format: str | None = None):
+        """One Format per (style, number format) per workbook."""
+        key = (style, num_format)
+        fmt = self._formats.get(key)
+        if fmt is None:
+            props = _format_props(STYLES[style]) if style else {}
+            if num_format:
+                props["num_format"] = num_format
+            fmt = self._formats[key] = self.wb.add_format(props)
+        return fmt
+
+    @staticmethod
+    def _image_options(spec: ImageSpec) -> dict:
+        # XlsxWriter sizes images from pixels and DPI – scale to the layout's box
+        in_memory = isinstance(spec.data, bytes)
+        with PILImage.open(BytesIO(spec.data) if in_memory else spec.data) as im:
+            (w, h), (dpi_x, dpi_y) = im.size, im.info.get("dpi", (96, 96))
+        options = {"object_position": 3,
+                   "x_scale": spec.width / (w * 96 / dpi_x),
+                   "y_scale": spec.height / (h * 96 / dpi_y)}
+        if in_memory:
+            options["image_data"] = BytesIO(spec.data)
+        return options
+
+    def _bar_chart(self, sheet: str, spec: ChartSpec):
+        first, last = spec.table_row, spec.table_row + spec.n_rows - 2      # 0-based data rows
+        chart = self.wb.add_chart({"type": "column"})
+        chart.add_series({
+            "categories": [sheet, first, spec.table_col - 1, last, spec.table_col - 1],
+            "values":     [sheet, first, spec.table_col, last, spec.table_col],
+            "data_labels": {"value": True},
+        })
+        chart.set_title({"name": spec.title, "overlay": False})
+        chart.set_legend({"none": True})
+        chart.set_x_axis({"label_position": "low", "major_tick_mark": "outside",
+                          "num_font": {"rotation": 45}})
+        y_axis = {"major_gridlines": {"visible": False}}
+        if spec.y_max is not None:
+            y_axis["max"] = spec.y_max
+        chart.set_y_axis(y_axis)
+        chart.set_size({"width": CHART_CM[0] * _CM_PX, "height": CHART_CM[1] * _CM_PX})
+        return chart
+
+    def add_sheet(self, title: str, layout: SheetLayout) -> None:
+        title = title[:31]                               # Excel's sheet-name limit
+        ws = self.wb.add_worksheet(title)
+        ws.hide_gridlines(2)
+        if layout.zoom:
+            ws.set_zoom(layout.zoom)
+        ws.set_default_row(ROW_HEIGHT)
+        for col, width in layout.col_widths.items():
+            ws.set_column(col - 1, col - 1, width)
+        for spec in layout.images:
+            # a path is only read when the workbook is closed
+            source = "map.png" if isinstance(spec.data, bytes) else spec.data
+            ws.insert_image(spec.row - 1, spec.col - 1, source, self._image_options(spec))
+        for spec in layout.charts:
+            ws.insert_chart(spec.row - 1, spec.col - 1, self._bar_chart(title, spec))
+
+        # constant_memory: rows strictly in order, row height before its cells
+        for r in range(1, layout.last_row + 1):
+            if r in layout.row_heights:
+                ws.set_row(r - 1, layout.row_heights[r])
+            for col, value, style in layout.rows.get(r, ()):
+                if isinstance(value, dt.datetime):
+                    fmt = self._format(style, "yyyy-mm-dd h:mm:ss")
+                elif isinstance(value, dt.date):
+                    fmt = self._format(style, "yyyy-mm-dd")
+                else:
+                    fmt = self._format(style) if style else None
+                    if isinstance(value, (float, np.floating)) and not np.isfinite(value):
+                        value = None                     # blank, as openpyxl writes it
+                ws.write(r - 1, col - 1, value, fmt)
+
+    def close(self) -> None:
+        self.wb.close()
+
+
+def make_report_writer(engine: str, path: str) -> ReportWriter:
+    """ "openpyxl" | "xlsxwriter" (openpyxl when XlsxWriter is not installed) """
+    match engine.lower():
+        case "openpyxl":
+            return OpenpyxlReportWriter(path)
+        case "xlsxwriter":
+            if not _HAS_XLSXWRITER:
+                log.warning("XlsxWriter not installed – writing the report with openpyxl")
+                return OpenpyxlReportWriter(path)
+            return XlsxWriterReportWriter(path)
+        case _:
+            raise ValueError(f"unknown report engine: {engine}")
+
+
+# ──────────────────────────────────────────────────────────
+# benchmark CLI – same site, both engines
+# ──────────────────────────────────────────────────────────
+def main(argv: list[str] | None = None) -> None:
+    from .SSV4G import SSV4G
+    from .data_source import make_data_source
+    from ..mutex_lock import lock
+
+    parser = argparse.ArgumentParser(prog="python -m tasks.SSV.report_writer")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    bench = sub.add_parser("bench", help="time every engine on one site's report")
+    bench.add_argument("--siteid", required=True)
+    bench.add_argument("--date", required=True, type=dt.date.fromisoformat)
+    bench.add_argument("--repeat", type=int, default=3)
+    bench.add_argument("--out", default="report_bench")
+    args = parser.parse_args(argv)
+
+    ssv = SSV4G(args.siteid, args.date, lock, task_id=0,
+                data_source=make_data_source(settings.SSV_DATA_SOURCE, settings.BASE_URL),
+                sql_grid=settings.SSV_SQL_GRID, render_profile=settings.SSV_RENDER_PROFILE)
+    ssv.query_data()
+    ssv.make_tables()
+    ssv.make_plots()
+    layout = ssv.report_layout()
+    os.makedirs(args.out, exist_ok=True)
+    print(f"site {args.siteid}: {len(ssv.cells)} cells, {len(layout.images)} maps, "
+          f"{len(layout.charts)} charts, {layout.last_row} rows")
+
+    engines = ["openpyxl"] + (["xlsxwriter"] if _HAS_XLSXWRITER else [])
+    for engine in engines:
+        path = os.path.join(args.out, f"{args.siteid}_{engine}.xlsx")
+        best, peak = float("inf"), 0
+        for _ in range(args.repeat):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            with make_report_writer(engine, path) as writer:
+                writer.add_sheet("SSV 4G Report", layout)
+            best = min(best, time.perf_counter() - t0)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        print(f"{engine:<10}  {best * 1000:8.1f} ms  peak {peak / 1024 ** 2:6.2f} MB  "
+              f"{os.path.getsize(path) / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
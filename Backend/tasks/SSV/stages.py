@@ -0,0 +1,80 @@
+# BACKEND/tasks/SSV/stages.py
+"""
+Persisted artifacts of the staged SSV pipeline (settings.SSV_STAGED_PIPELINE).
+
+    fetch   query + tables          → <stage>/report.pkl
+                                      <stage>/cell_000.job.pkl …   (render_pool.py jobs)
+    plot    one cell's job          → <stage>/cell_000.maps.pkl    ({kpi: image bytes})
+    report  report.pkl + maps.pkl's → workbook (or group-workbook sheet)
+
+<stage> = <SSV_STAGE_DIR>/<item_id>.  Every stage may run on another worker
+host, so SSV_STAGE_DIR has to be storage all of them see.  The Celery tasks
+live in tasks/ssv_worker.py; this module only reads and writes the files.
+"""
+from __future__ import annotations
+
+import pickle
+import shutil
+import uuid
+from pathlib import Path
+
+from config import settings
+from .render_cache import render_cached
+from .render_pool import render_cells
+
+
+def stage_dir(item_id: int) -> Path:
+    root = settings.SSV_STAGE_DIR or Path(__file__).resolve().parents[2] / "cache" / "stages"
+    return Path(root) / str(item_id)
+
+
+def _dump(path: Path, obj) -> None:
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "wb") as fh:
+        pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)                            # a reader never sees half a file
+
+
+def _load(path: Path):
+    with open(path, "rb") as fh:
+        return pickle.load(fh)
+
+
+def save_fetch(item_id: int, ssv, jobs: list[dict]) -> list[str]:
+    """Fetch stage output; returns one job name per cell for the plot fan-out."""
+    root = stage_dir(item_id)
+    shutil.rmtree(root, ignore_errors=True)      # a retried fetch starts clean
+    root.mkdir(parents=True)
+
+    _dump(root / "report.pkl", {"overall_data": ssv.overall_data, "kpi": ssv.kpi,
+                                "tables": ssv.tables, "cells": ssv.cells})
+    names = []
+    for i, job in enumerate(jobs):
+        name = f"cell_{i:03d}"
+        _dump(root / f"{name}.job.pkl", job)
+        names.append(name)
+    return names
+
+
+def render_job(item_id: int, name: str, *, use_cache: bool) -> None:
+    """Plot stage: draw one cell's maps."""
+    root = stage_dir(item_id)
+    job = _load(root / f"{name}.job.pkl")
+    images = (render_cached if use_cache else render_cells)([job])
+    _dump(root / f"{name}.maps.pkl", (job["cell"], images.get(job["cell"], {})))
+
+
+def load_report(item_id: int, ssv) -> None:
+    """Report stage: put the fetched frames, tables and every rendered map back on *ssv*."""
+    root = stage_dir(item_id)
+    state = _load(root / "report.pkl")
+    ssv.overall_data, ssv.kpi = state["overall_data"], state["kpi"]
+    ssv.tables, ssv.cells = state["tables"], state["cells"]
+    ssv.plots = {cell: {} for cell in ssv.cells}
+    for path in sorted(root.glob("*.maps.pkl")):  # a failed plot task leaves none
+        cell, images = _load(path)
+        ssv.plots.setdefault(cell, {}).update(images)
+
+
+def drop(item_id: int) -> None:
+    shutil.rmtree(stage_dir(item_id), ignore_errors=True)
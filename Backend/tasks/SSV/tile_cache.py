@@ -0,0 +1,351 @@
+# BACKEND/tasks/SSV/tile_cache.py
+"""
+Local basemap tiles for SpatialKPIDensityPlot (instead of ctx.add_basemap).
+
+* TileStore   – one SQLite file in MBTiles layout (tiles / metadata tables,
+                TMS row numbering) plus a `last_used` column for LRU eviction
+                once the file grows past *max_bytes*
+* TileFetcher – store first, network only on a miss; offline=True never
+                touches the network (missing tiles stay transparent)
+* basemap()   – stitched RGBA array + EPSG:3857 extent for ax.imshow
+                (small LRU of stitched windows, shared by a site's cells)
+
+Pre-warm from celldb (all sites, or some) – against a self-hosted tile
+server only; the OpenStreetMap tile servers forbid bulk downloads:
+
+    python -m tasks.SSV.tile_cache prewarm --url http://tiles.local/{z}/{x}/{y}.png \
+                                           [--siteid 69491 ...] [--km 8]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import settings
+
+log = logging.getLogger("ssv.tile_cache")
+
+TILE_PX   = 256
+ORIGIN    = 20037508.342789244          # half the Web-Mercator world width (m)
+MAX_ZOOM  = 19
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level  INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row    INTEGER NOT NULL,
+    tile_data   BLOB    NOT NULL,
+    last_used   REAL    NOT NULL,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+);
+CREATE INDEX IF NOT EXISTS tiles_last_used ON tiles (last_used);
+"""
+
+
+# ──────────────────────────────────────────────────────────
+# tile math (EPSG:3857, XYZ numbering – y grows southwards)
+# ──────────────────────────────────────────────────────────
+def tile_span(z: int) -> float:
+    return 2 * ORIGIN / 2 ** z
+
+
+def auto_zoom(width_m: float) -> int:
+    """Same rule as contextily: ~2-4 tiles across the frame."""
+    return int(min(MAX_ZOOM, math.ceil(math.log2(2 * 2 * ORIGIN / width_m))))
+
+
+def tiles_for(x0: float, y0: float, x1: float, y1: float, z: int) -> tuple[range, range]:
+    span = tile_span(z)
+    last = 2 ** z - 1
+    xs = range(max(0, int((x0 + ORIGIN) // span)), min(last, int((x1 + ORIGIN) // span)) + 1)
+    ys = range(max(0, int((ORIGIN - y1) // span)), min(last, int((ORIGIN - y0) // span)) + 1)
+    return xs, ys
+
+
+# ──────────────────────────────────────────────────────────
+# 1) SQLite / MBTiles store
+# ──────────────────────────────────────────────────────────
+class TileStore:
+    TOUCH_AFTER_S = 3600                 # refresh last_used at most hourly per tile
+    EVICT_EVERY   = 64                   # puts between two size checks
+
+    def __init__(self, path: str | Path, *, max_bytes: int = 1024 * 1024 ** 2):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()   # one connection per thread
+        self._puts = 0
+        self._puts_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+            conn.executemany(
+                "INSERT OR IGNORE INTO metadata (name, value) VALUES (?, ?)",
+                [("name", "ssv-basemap"), ("format", "png"), ("type", "baselayer")],
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(z: int, y: int) -> int:
+        return 2 ** z - 1 - y            # MBTiles stores TMS rows
+
+    def get(self, z: int, x: int, y: int) -> bytes | None:
+        conn = self._conn()
+        key = (z, x, self._row(z, y))
+        hit = conn.execute(
+            "SELECT tile_data, last_used FROM tiles"
+            " WHERE zoom_level=? AND tile_column=? AND tile_row=?", key
+        ).fetchone()
+        if hit is None:
+            return None
+        now = time.time()
+        if now - hit[1] > self.TOUCH_AFTER_S:
+            conn.execute(
+                "UPDATE tiles SET last_used=?"
+                " WHERE zoom_level=? AND tile_column=? AND tile_row=?", (now, *key)
+            )
+        return hit[0]
+
+    def has(self, z: int, x: int, y: int) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+            (z, x, self._row(z, y)),
+        ).fetchone() is not None
+
+    def put(self, z: int, x: int, y: int, data: bytes) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?)",
+            (z, x, self._row(z, y), sqlite3.Binary(data), time.time()),
+        )
+        with self._puts_lock:
+            self._puts += 1
+            due = self._puts % self.EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def size_bytes(self) -> int:
+        return self._conn().execute(
+            "SELECT COALESCE(SUM(LENGTH(tile_data)), 0) FROM tiles"
+        ).fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least-recently-used tiles until the store fits *max_bytes*."""
+        conn = self._conn()
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        victims, freed = [], 0
+        for z, x, row, size in conn.execute(
+            "SELECT zoom_level, tile_column, tile_row, LENGTH(tile_data)"
+            " FROM tiles ORDER BY last_used"
+        ):
+            victims.append((z, x, row))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany(
+            "DELETE FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", victims
+        )
+        log.info("evicted %d tiles (%d bytes)", len(victims), freed)
+        return len(victims)
+
+
+# ──────────────────────────────────────────────────────────
+# 2) store-first fetcher
+# ──────────────────────────────────────────────────────────
+class TileFetcher:
+    STITCHED_MAX = 16                    # stitched basemaps kept per process
+
+    def __init__(self, store: TileStore, *, url: str, offline: bool = False,
+                 user_agent: str = "Reporter-SSV/1.0", timeout: int = 10):
+        self.store = store
+        self.url = url
+        self.offline = offline
+        self.timeout = timeout
+        self.misses = 0                  # tiles not available (offline / failed)
+        # stitched basemaps by tile window – the cells of a site share them
+        self._stitched: OrderedDict[tuple, tuple[np.ndarray, tuple]] = OrderedDict()
+        self._stitched_lock = threading.Lock()
+
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                      allowed_methods=frozenset({"GET"}))
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=8, max_retries=retry))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=8, max_retries=retry))
+        self.session.headers.update({"User-Agent": user_agent})
+
+    def tile(self, z: int, x: int, y: int) -> bytes | None:
+        data = self.store.get(z, x, y)
+        if data is not None or self.offline:
+            if data is None:
+                self.misses += 1
+            return data
+        try:
+            r = self.session.get(self.url.format(z=z, x=x, y=y), timeout=self.timeout)
+            r.raise_for_status()
+        except requests.RequestException as exc:
+            self.misses += 1
+            log.warning("tile %s/%s/%s: %s", z, x, y, exc)
+            return None
+        self.store.put(z, x, y, r.content)
+        return r.content
+
+    def basemap(self, x0: float, y0: float, x1: float, y1: float,
+                zoom: int | None = None
+                ) -> tuple[np.ndarray, tuple[float, float, float, float], bool]:
+        """
+        Stitch the tiles covering [x0, x1] × [y0, y1] (EPSG:3857).
+        Returns (RGBA uint8 image, (left, right, bottom, top), complete) –
+        image and extent for ax.imshow, complete False when a tile was
+        missing and its area left transparent.
+        """
+        z = auto_zoom(x1 - x0) if zoom is None else zoom
+        cols, rows = tiles_for(x0, y0, x1, y1, z)
+        key = (z, cols.start, cols.stop, rows.start, rows.stop)
+        with self._stitched_lock:
+            if key in self._stitched:
+                self._stitched.move_to_end(key)
+                return self._stitched[key] + (True,)
+
+        complete = True
+        img = np.zeros((len(rows) * TILE_PX, len(cols) * TILE_PX, 4), dtype=np.uint8)
+        for j, ty in enumerate(rows):
+            for i, tx in enumerate(cols):
+                data = self.tile(z, tx, ty)
+                if data is None:
+                    complete = False
+                    continue                         # stays transparent
+                tile = Image.open(BytesIO(data)).convert("RGBA")
+                img[j * TILE_PX:(j + 1) * TILE_PX, i * TILE_PX:(i + 1) * TILE_PX] = np.asarray(tile)
+
+        span = tile_span(z)
+        left, top = cols.start * span - ORIGIN, ORIGIN - rows.start * span
+        result = img, (left, left + len(cols) * span, top - len(rows) * span, top)
+        if complete:                                 # don't pin holes in memory
+            img.setflags(write=False)
+            with self._stitched_lock:
+                self._stitched[key] = result
+                while len(self._stitched) > self.STITCHED_MAX:
+                    self._stitched.popitem(last=False)
+        return result + (complete,)
+
+    def prewarm(self, x: float, y: float, half_m: float, zooms) -> int:
+        """Fetch every missing tile of a ±half_m window at each zoom; returns #fetched."""
+        fetched = 0
+        for z in zooms:
+            cols, rows = tiles_for(x - half_m, y - half_m, x + half_m, y + half_m, z)
+            for ty in rows:
+                for tx in cols:
+                    if not self.store.has(z, tx, ty) and self.tile(z, tx, ty) is not None:
+                        fetched += 1
+        return fetched
+
+
+# ──────────────────────────────────────────────────────────
+# one store + fetcher per worker process
+# ──────────────────────────────────────────────────────────
+_fetcher: TileFetcher | None = None
+_fetcher_lock = threading.Lock()
+
+
+def get_tile_fetcher() -> TileFetcher:
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            path = settings.SSV_TILE_CACHE or \
+                Path(__file__).resolve().parents[2] / "cache" / "tiles.mbtiles"
+            _fetcher = TileFetcher(
+                TileStore(path, max_bytes=settings.SSV_TILE_CACHE_MAX_MB * 1024 ** 2),
+                url=settings.SSV_TILE_URL,
+                offline=settings.SSV_TILES_OFFLINE,
+            )
+        return _fetcher
+
+
+# ──────────────────────────────────────────────────────────
+# pre-warm CLI – sites from celldb
+# ──────────────────────────────────────────────────────────
+def _prewarm_zooms(min_km: float, max_km: float) -> list[int]:
+    # every zoom auto_zoom picks for the map windows SSV4G.make_plots can draw
+    return sorted({auto_zoom(km * 1000) for km in np.arange(min_km, max_km + 0.05, 0.1)})
+
+
+def _prewarm_half_m(z: int, half_m: float) -> float:
+    # auto_zoom only picks z for windows narrower than 8·ORIGIN / 2^z, so the
+    # deep zooms never need the full ±half_m (z16: ±1.2 km instead of ±4 km)
+    return min(half_m, 2 * tile_span(z))
+
+
+def _is_osm(url: str) -> bool:
+    host = urlsplit(url.replace("{", "").replace("}", "")).hostname or ""
+    return host == "tile.openstreetmap.org" or host.endswith(".tile.openstreetmap.org")
+
+
+def main(argv: list[str] | None = None) -> None:
+    from sqlalchemy import select
+
+    from database.db import sync_engine
+    from database.models import celldb
+    from .projection import to_web_mercator
+
+    parser = argparse.ArgumentParser(prog="python -m tasks.SSV.tile_cache")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    warm = sub.add_parser("prewarm", help="fill the tile store for celldb sites")
+    warm.add_argument("--siteid", type=int, nargs="*", help="default: every site in celldb")
+    warm.add_argument("--min-km", type=float, default=2.0)
+    warm.add_argument("--km", type=float, default=8.0, help="largest map window (km)")
+    warm.add_argument("--url", required=True,
+                      help="tile URL template of a self-hosted server (not OSM's)")
+    args = parser.parse_args(argv)
+    if _is_osm(args.url):
+        parser.error("bulk pre-warming from tile.openstreetmap.org breaks the OSM tile "
+                     "usage policy – use a self-hosted tile server")
+    if settings.SSV_TILES_OFFLINE:
+        parser.error("SSV_TILES_OFFLINE is set – nothing can be fetched")
+
+    stmt = select(celldb.c.siteid, celldb.c.longitude, celldb.c.latitude) \
+        .distinct(celldb.c.siteid).order_by(celldb.c.siteid)
+    if args.siteid:
+        stmt = stmt.where(celldb.c.siteid.in_(args.siteid))
+    with sync_engine.connect() as conn:
+        sites = conn.execute(stmt).all()
+
+    fetcher = TileFetcher(get_tile_fetcher().store, url=args.url)
+    zooms = _prewarm_zooms(args.min_km, args.km)
+    half_m = args.km * 1000 / 2
+
+    total = 0
+    for n, (siteid, lon, lat) in enumerate(sites, 1):
+        x, y = to_web_mercator(float(lon), float(lat))
+        got = sum(fetcher.prewarm(x, y, _prewarm_half_m(z, half_m), [z]) for z in zooms)
+        total += got
+        print(f"[{n}/{len(sites)}] site {siteid}: {got} new tiles")
+    fetcher.store.evict()
+    print(f"done – {total} tiles fetched, store {fetcher.store.size_bytes() / 1024 ** 2:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
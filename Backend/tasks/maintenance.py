@@ -10,6 +10,7 @@ from celery import shared_task
 from database.db import session_scope           # your helper from db.py
 from database.models_tasks import TaskGroup
 from database.result_archiver import ResultArchiver      # zips live here
+from tasks.SSV.data_cache import get_site_cache
 
 # ────────────────────────────────────────────────────────────────
 # configuration – change in one place
@@ -62,6 +63,21 @@ def cleanup_tmp() -> str:
     return f"cleanup removed {len(removed)} group(s): {removed or 'none'}"
 
 
+@shared_task(name="tasks.maintenance.invalidate_ssv_cache")
+def invalidate_ssv_cache(siteid: str | None = None,
+                         site_date: str | None = None,
+                         tech: str | None = None) -> str:
+    """
+    Manual shortcut after a re-ingest of all_data / kpi_data: the next report
+    for those sites re-reads the database instead of waiting out
+    SSV_CACHE_TTL_S.  None matches everything.  Reaches other worker
+    processes only through the cache's disk layer (needs pyarrow) – see
+    tasks/SSV/data_cache.py.
+    """
+    removed = get_site_cache().invalidate(siteid=siteid, site_date=site_date, tech=tech)
+    return f"invalidated {removed} cached SSV entr(y/ies)"
+
+
 # ---------------------------------------------------------------------------
 
 def _delete_dir(path: Path) -> None:
@@ -1,11 +1,44 @@
 # BACKEND/tasks/ssv_worker.py
-from celery import shared_task
+import logging
+from collections import defaultdict
 
-from database.ssv_task_service import mark_started_sync, mark_done_sync,get_ssv_args_sync
+from celery import chord, group, shared_task
+from celery.utils import uuid
+
+from database.ssv_task_service import (
+    mark_started_sync, mark_done_sync, get_ssv_args_sync, get_group_ssv_args_sync,
+    get_group_item_ids_sync, set_celery_ids_sync, notify_group_sync, fail_group_sync,
+)
+from database.result_archiver import ResultArchiver
 from .SSV.SSV4G import SSV4G
+from .SSV.data_source import make_data_source
+from .SSV.api_client import log_api_metrics
+from .SSV.data_cache import get_site_cache
+from .SSV import stages
+from .SSV.group_workbook import assemble_group_workbook, split_group_workbook
 from .mutex_lock import lock
 from config import settings
 
+log = logging.getLogger("ssv.worker")
+
+
+def _lte_report(task_id, site_id, date, tech, grid_mode) -> SSV4G:
+    return SSV4G(siteid=site_id,
+                 task_date=date,
+                 mutex_lock=lock,
+                 BASE_URL=settings.BASE_URL,
+                 task_id=task_id,
+                 data_source=make_data_source(settings.SSV_DATA_SOURCE,
+                                              settings.BASE_URL),
+                 sql_grid=settings.SSV_SQL_GRID,
+                 tech=tech,
+                 cache=get_site_cache() if settings.SSV_CACHE_ENABLED else None,
+                 render_profile=settings.SSV_RENDER_PROFILE,
+                 grid_mode=grid_mode or settings.SSV_GRID_MODE,
+                 vector_grid=settings.SSV_VECTOR_GRID,
+                 render_cache=settings.SSV_RENDER_CACHE_ENABLED,
+                 report_engine=settings.SSV_REPORT_ENGINE,
+                 group_workbook=settings.SSV_GROUP_WORKBOOK)
 
 
 @shared_task(bind=True)
@@ -14,18 +47,14 @@ def process_one_item(self, item_id: int):
     mark_started_sync(item_id, self.request.id)
 
     # ---------- real work ----------
-    task_id, site_id, date, tech = get_ssv_args_sync(item_id)
+    task_id, site_id, date, tech, grid_mode = get_ssv_args_sync(item_id)
     try:
         match tech:
             case "NR":
                 pass
             case "LTE":
                 print("HERE")
-                ssv = SSV4G(siteid=site_id,
-                            task_date=date,
-                            mutex_lock=lock,
-                            BASE_URL=settings.BASE_URL,
-                            task_id=task_id)
+                ssv = _lte_report(task_id, site_id, date, tech, grid_mode)
                 ssv.build()
             case "UMTS":
                 pass
@@ -38,9 +67,214 @@ def process_one_item(self, item_id: int):
         mark_done_sync(item_id, ok=False, result=str(exc))
     else:
         mark_done_sync(item_id, ok=True, result="ok")
+    finally:
+        log_api_metrics()
     
     # --------------------------------
     return f' itemid: {item_id} rest:{task_id} {site_id} {date} {tech}'
-    
 
-    
+
+# ──────────────────────────────────────────────────────────
+# staged pipeline (settings.SSV_STAGED_PIPELINE)
+#   ssv_fetch_item → group(ssv_plot_cell per cell) → ssv_report_item
+#   each stage on its own queue with its own time limit; the
+#   intermediate artifacts live in tasks/SSV/stages.py
+# ──────────────────────────────────────────────────────────
+def item_task():
+    """The Celery task that runs one TaskItem end to end."""
+    return ssv_fetch_item if settings.SSV_STAGED_PIPELINE else process_one_item
+
+
+@shared_task(bind=True, queue="ssv_fetch",
+             soft_time_limit=settings.SSV_FETCH_TIME_LIMIT,
+             time_limit=settings.SSV_FETCH_TIME_LIMIT + 30)
+def ssv_fetch_item(self, item_id: int):
+    """Query + tables (+ vector grid), persist them, fan the maps out per cell."""
+    try:
+        mark_started_sync(item_id, self.request.id)
+        task_id, site_id, date, tech, grid_mode = get_ssv_args_sync(item_id)
+        if tech != "LTE":                        # nothing to stage (see process_one_item)
+            mark_done_sync(item_id, ok=True, result="ok")
+            return f' itemid: {item_id} rest:{task_id} {site_id} {date} {tech}'
+
+        ssv = _lte_report(task_id, site_id, date, tech, grid_mode)
+        ssv.query_data()
+        ssv.make_tables()
+        if ssv.vector_grid:
+            ssv.write_grid_geojson()
+        names = stages.save_fetch(item_id, ssv, ssv.plot_jobs())
+
+        # a header task killed outright (hard limit, lost worker, revoke) fails
+        # the chord – the errback then settles the item instead of the report
+        report = ssv_report_item.s(item_id).on_error(ssv_stage_failed.s(item_id))
+        if names:
+            chord(group(ssv_plot_cell.s(item_id, name) for name in names), report).apply_async()
+        else:                                    # no cell has samples – report without maps
+            report.delay([])
+    except Exception as exc:
+        stages.drop(item_id)
+        mark_done_sync(item_id, ok=False, result=str(exc))
+        return f' itemid: {item_id} fetch failed'
+    finally:
+        log_api_metrics()
+    return f' itemid: {item_id} cells:{len(names)}'
+
+
+@shared_task(bind=True, queue="ssv_plot",
+             soft_time_limit=settings.SSV_PLOT_TIME_LIMIT,
+             time_limit=settings.SSV_PLOT_TIME_LIMIT + 30)
+def ssv_plot_cell(self, item_id: int, name: str):
+    """
+    One cell's maps.  Never raises – a failed cell only loses its maps,
+    the chord still fires and the report is written without them.
+    """
+    try:
+        stages.render_job(item_id, name, use_cache=settings.SSV_RENDER_CACHE_ENABLED)
+    except Exception:
+        log.exception("plot stage %s of item %s failed", name, item_id)
+        return None
+    return name
+
+
+@shared_task(bind=True, queue="ssv_report",
+             soft_time_limit=settings.SSV_REPORT_TIME_LIMIT,
+             time_limit=settings.SSV_REPORT_TIME_LIMIT + 30)
+def ssv_report_item(self, plotted: list, item_id: int):
+    """
+    Chord callback: workbook (or group-workbook sheet) from the stage artifacts.
+    Cells whose plot task failed are reported without maps; if every cell
+    failed (e.g. SSV_STAGE_DIR not shared between hosts) the item fails.
+    """
+    missing = sum(1 for name in plotted if name is None)
+    try:
+        if plotted and missing == len(plotted):
+            raise RuntimeError(f"plot stage failed for all {missing} cells")
+        task_id, site_id, date, tech, grid_mode = get_ssv_args_sync(item_id)
+        ssv = _lte_report(task_id, site_id, date, tech, grid_mode)
+        stages.load_report(item_id, ssv)
+        ssv.write_report()
+    except Exception as exc:
+        mark_done_sync(item_id, ok=False, result=str(exc))
+    else:
+        mark_done_sync(item_id, ok=True,
+                       result=f"ok, failed:{missing}/{len(plotted)} cells" if missing else "ok")
+    finally:
+        stages.drop(item_id)
+
+    return f' itemid: {item_id} cells:{len(plotted)} failed:{missing}'
+
+
+@shared_task(queue="ssv_report")
+def ssv_stage_failed(request, exc, traceback, item_id: int):
+    """Errback of the report chord – the header or the report itself died."""
+    log.error("staged item %s failed in task %s: %r", item_id, request.id, exc)
+    try:
+        mark_done_sync(item_id, ok=False, result=f"stage failed: {exc!r}")
+    finally:
+        stages.drop(item_id)
+
+
+# ──────────────────────────────────────────────────────────
+# group finalisation – sent by the service once a group is DONE
+# ──────────────────────────────────────────────────────────
+@shared_task(bind=True, name="tasks.ssv_worker.finalize_ssv_group", queue="ssv_report",
+             soft_time_limit=settings.SSV_ASSEMBLE_TIME_LIMIT,
+             time_limit=settings.SSV_ASSEMBLE_TIME_LIMIT + 30)
+def finalize_ssv_group(self, group_id: int):
+    """
+    Assemble the group workbook (settings.SSV_GROUP_WORKBOOK), then zip
+    outputs/<gid>.  A failed assembly falls back to one workbook per site;
+    if that fails too the group is marked ERROR rather than zipping the
+    raw .sheet dirs.  DONE is announced only once the zip exists.
+    """
+    archiver = ResultArchiver()
+    raw_root = archiver.outputs_dir / str(group_id)
+    try:
+        if settings.SSV_GROUP_WORKBOOK:
+            try:
+                assemble_group_workbook(raw_root, settings.SSV_REPORT_ENGINE)
+            except Exception:
+                log.exception("group %s: workbook assembly failed – writing per-site workbooks",
+                              group_id)
+                split_group_workbook(raw_root, settings.SSV_REPORT_ENGINE)
+        archiver.archive_group(group_id)
+    except Exception:
+        log.exception("group %s: finalisation failed", group_id)
+        fail_group_sync(group_id)
+        return f' group: {group_id} finalisation failed'
+    notify_group_sync(group_id)
+    return f' group: {group_id} archived'
+
+
+# ──────────────────────────────────────────────────────────
+# group prefetch – one set-based fetch for all sites, then dispatch
+# ──────────────────────────────────────────────────────────
+@shared_task(bind=True,
+             soft_time_limit=settings.SSV_PREFETCH_TIME_LIMIT,
+             time_limit=settings.SSV_PREFETCH_TIME_LIMIT + 30)
+def prefetch_ssv_group(self, group_id: int):
+    """
+    Fill the site cache for every LTE site of *group_id* (per date: one
+    query per table instead of one per site), then queue the items.
+    A failed prefetch only costs the speed-up – the items fetch on their own,
+    and are queued whatever happened here (even on the soft time limit).
+    """
+    cached = 0
+    try:
+        cached = _prefetch_group(group_id)
+    except Exception:
+        log.exception("prefetch of group %s failed – queueing its items without it", group_id)
+    finally:
+        n = dispatch_items(get_group_item_ids_sync(group_id))
+        log_api_metrics()
+    return f' group: {group_id} items:{n} prefetched:{cached}'
+
+
+def _prefetch_group(group_id: int) -> int:
+    """Sites of *group_id* put into the site cache."""
+    by_day: dict[tuple, list[str]] = defaultdict(list)
+    for _, args in get_group_ssv_args_sync(group_id):
+        if args.tech == "LTE":
+            by_day[(args.date, args.tech)].append(args.site_id)
+
+    cache = get_site_cache()
+    source = make_data_source(settings.SSV_DATA_SOURCE, settings.BASE_URL)
+    cached = 0
+    for (site_date, tech), siteids in by_day.items():
+        missing = [s for s in dict.fromkeys(siteids) if cache.get(s, site_date, tech) is None]
+        if not missing:
+            continue
+        try:
+            frames_by_site = source.prefetch(missing, site_date,
+                                             sql_grid=settings.SSV_SQL_GRID) or {}
+        except Exception:
+            log.exception("prefetch of group %s (%s, %s) failed", group_id, site_date, tech)
+            continue
+        for siteid, frames in frames_by_site.items():
+            cache.put(siteid, site_date, tech, frames)
+        cached += len(frames_by_site)
+    return cached
+
+
+# ──────────────────────────────────────────────────────────
+# bulk dispatch – the API publishes one message per group,
+# the worker fans the items out
+# ──────────────────────────────────────────────────────────
+def dispatch_items(item_ids: list[int]) -> int:
+    """
+    Queue every item as one Celery group (one producer connection for all
+    messages).  Task ids are chosen up front and written in one UPDATE
+    before anything is sent, so each item has its celery_uuid while queued.
+    """
+    task = item_task()
+    celery_ids = {item_id: uuid() for item_id in item_ids}
+    set_celery_ids_sync(celery_ids)
+    group(task.s(item_id).set(task_id=tid) for item_id, tid in celery_ids.items()).apply_async()
+    return len(celery_ids)
+
+
+@shared_task(bind=True)
+def dispatch_ssv_group(self, group_id: int):
+    """Queue the items of *group_id* (used when the group prefetch is off)."""
+    n = dispatch_items(get_group_item_ids_sync(group_id))
+    return f' group: {group_id} items:{n}'
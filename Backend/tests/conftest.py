@@ -0,0 +1,5 @@
+# BACKEND/tests/conftest.py
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))    # Backend/ → `tasks`, `config`
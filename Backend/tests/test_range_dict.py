@@ -0,0 +1,34 @@
+# BACKEND/tests/test_range_dict.py
+"""RangeDict: every mutation keeps the compiled lookup arrays in step with the keys."""
+import numpy as np
+
+from tasks.SSV.RangeDict import RangeDict
+
+
+def _ranges() -> RangeDict:
+    return RangeDict({"-:0": "red", "0:10": "green", "10:+": "blue"})
+
+
+def test_lookup_follows_every_mutation():
+    rd = _ranges()
+    assert rd[5] == "green"
+
+    rd.pop("0:10")
+    assert rd.lookup([5]).tolist() == [-1]
+    assert rd[-1] == "red" and rd[15] == "blue"
+
+    rd.setdefault("0:10", "yellow")
+    assert rd[5] == "yellow"
+
+    rd |= {"-:0": "grey"}
+    assert rd[-1] == "grey"
+
+    rd.popitem()                                  # the re-added "0:10"
+    assert rd.lookup([-1, 5, 15]).tolist() == [0, -1, 1]
+
+    rd.clear()
+    assert rd.lookup(np.array([-1.0, 5.0])).tolist() == [-1, -1]
+
+
+def test_lookup_is_half_open_and_skips_nan():
+    assert _ranges().lookup([0.0, 10.0, np.nan]).tolist() == [1, 2, -1]
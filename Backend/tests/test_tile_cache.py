@@ -0,0 +1,88 @@
+# BACKEND/tests/test_tile_cache.py
+"""tile_cache.py against a local tile-server stand-in: fetch → store → offline render."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from tasks.SSV import tile_cache
+from tasks.SSV.tile_cache import TileFetcher, TileStore, tiles_for
+
+TILE_COLOUR = (200, 30, 30, 255)
+
+
+def _png() -> bytes:
+    buf = BytesIO()
+    Image.new("RGBA", (256, 256), TILE_COLOUR).save(buf, "PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def tile_server():
+    """http://127.0.0.1:<port>/{z}/{x}/{y}.png – one flat tile, requests counted."""
+    body, hits = _png(), []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/{{z}}/{{x}}/{{y}}.png", hits
+    server.shutdown()
+    server.server_close()
+
+
+# a 2 km window in central Ankara (EPSG:3857)
+WINDOW = (3_656_000.0, 4_853_000.0, 3_658_000.0, 4_855_000.0)
+
+
+def test_fetch_store_offline_render(tmp_path, tile_server):
+    url, hits = tile_server
+    store = TileStore(tmp_path / "tiles.mbtiles")
+
+    online = TileFetcher(store, url=url)
+    img, extent, complete = online.basemap(*WINDOW)
+    assert complete and hits
+    z = tile_cache.auto_zoom(WINDOW[2] - WINDOW[0])
+    cols, rows = tiles_for(*WINDOW, z)
+    assert len(hits) == len(cols) * len(rows)
+    assert all(store.has(z, x, y) for x in cols for y in rows)
+
+    # offline, fresh process state: everything from the store, no request
+    served = len(hits)
+    offline = TileFetcher(store, url=url, offline=True)
+    img, extent, complete = offline.basemap(*WINDOW)
+    assert complete and len(hits) == served and offline.misses == 0
+    assert tuple(img[0, 0]) == TILE_COLOUR
+    assert extent[0] <= WINDOW[0] and extent[1] >= WINDOW[2]
+
+
+def test_offline_miss_leaves_hole(tmp_path, tile_server):
+    url, hits = tile_server
+    offline = TileFetcher(TileStore(tmp_path / "tiles.mbtiles"), url=url, offline=True)
+    img, _, complete = offline.basemap(*WINDOW)
+    assert not complete and not hits
+    assert not np.asarray(img)[..., 3].any()                 # transparent
+
+
+def test_prewarm_refuses_osm():
+    with pytest.raises(SystemExit):
+        tile_cache.main(["prewarm", "--url", "https://tile.openstreetmap.org/{z}/{x}/{y}.png"])
+
+
+def test_prewarm_clips_deep_zooms():
+    half_m = 4000
+    assert tile_cache._prewarm_half_m(12, half_m) == half_m
+    assert tile_cache._prewarm_half_m(16, half_m) < 1300
@@ -32,3 +32,19 @@ export async function apiDownload(path, filename) {
   a.click();
   URL.revokeObjectURL(url);
 }
+
+/* 50 m coverage grid of some cells as GeoJSON (lon/lat squares + legend) */
+export async function fetchGridGeoJSON(siteidCellids, date, { kpi, gridSize } = {}) {
+  const params = new URLSearchParams({
+    siteid_cellids: JSON.stringify(siteidCellids),
+    date,
+  });
+  if (kpi) params.set("kpi", kpi);
+  if (gridSize) params.set("grid_size", String(gridSize));
+  return fetchJSON(`/ssv/grid_geojson/?${params}`);
+}
+
+/* counts by status + percent_done of one batch (no item list) */
+export async function fetchGroupProgress(groupId) {
+  return fetchJSON(`/ssv_task/group/${groupId}/progress`);
+}